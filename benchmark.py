@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import io
+import glob
+import json
+import time
+import random
+import argparse
+import platform
+import contextlib
+import subprocess
+import input_parser
+import genetic_solver
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+
+DEFAULT_INSTANCES = 'test_instances/*.txt'
+DEFAULT_OUTPUT = 'benchmarks/results.json'
+DEFAULT_BASELINE = 'benchmarks/baseline.json'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark of the genetic algorithm over the problem instances')
+    parser.add_argument('instances', nargs='*',
+                        help='problem instances (default: every instance in {})'.format(DEFAULT_INSTANCES))
+    parser.add_argument('--seeds', type=int, nargs='+', default=[1], help='seeds for the runs on each instance')
+    parser.add_argument('--time-budget', type=float, default=60, help='time budget of each run in seconds')
+    parser.add_argument('--generations', type=int, default=None,
+                        help='number of generations (default: as in the parameters of the genetic algorithm)')
+    parser.add_argument('--processes', type=int, default=1, help='number of worker processes of each run')
+    parser.add_argument('--islands', type=int, default=1, help='number of islands (populations) of each run')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='seconds after which a run gets killed (default: twice the time budget plus 30)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='file to write the results to')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='results file to compare the results to')
+    parser.add_argument('--tolerance', type=float, default=0.05,
+                        help='relative difference to the baseline which counts as a regression')
+    parser.add_argument('--run', metavar='PARAMETERS', help=argparse.SUPPRESS)  # a single run (in a subprocess)
+    args = parser.parse_args(argv)
+
+    parameters = {'time_budget': args.time_budget, 'num_processes': args.processes, 'num_islands': args.islands}
+    if args.generations is not None:
+        parameters['number_of_generations'] = args.generations
+
+    if args.run is not None:
+        print(json.dumps(run_instance(args.instances[0], args.seeds[0], json.loads(args.run))))
+        return 0
+
+    instances = args.instances or sorted(filename for filename in glob.glob(DEFAULT_INSTANCES)
+                                         if '.sol' not in filename)
+    timeout = args.timeout if args.timeout is not None else 2 * args.time_budget + 30
+
+    runs = []
+    for filename in instances:
+        for seed in args.seeds:
+            result = run_in_subprocess(filename, seed, parameters, timeout)
+            runs.append(result)
+            print('{} (seed {}): {}'.format(filename, seed, format_result(result)))
+
+    results = {'python': platform.python_version(),
+               'machine': platform.machine(),
+               'parameters': dict(genetic_solver.PARAMETERS, **parameters),
+               'runs': runs}
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print('Results written to ' + args.output)
+
+    if not os.path.exists(args.baseline):
+        return 0
+
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+    regressions = compare_results(baseline, results, args.tolerance)
+    print('{} regression(s) compared to {}'.format(len(regressions), args.baseline))
+    for regression in regressions:
+        print('    ' + regression)
+    return 1 if regressions else 0
+
+
+def run_in_subprocess(filename, seed, parameters, timeout):
+    """Run the genetic algorithm on an instance in a separate process.
+
+    Every run gets its own process, such that its peak memory can be measured, and such that it can be killed
+    if it does not finish in time (e.g. if repairing a candidate takes too long).
+    :param filename: The name of the file containing the problem instance
+    :param seed: The seed for the random number generator
+    :param parameters: The parameters of the genetic algorithm which differ from the defaults
+    :param timeout: The number of seconds after which the run gets killed
+    :return: The result of the run (a dictionary)
+    """
+    command = [sys.executable, os.path.abspath(__file__), filename, '--seeds', str(seed),
+               '--run', json.dumps(parameters)]
+
+    result = {'instance': os.path.basename(filename), 'seed': seed}
+    # a new session, such that the worker processes get killed along with the run
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+                               start_new_session=True)
+    try:
+        (stdout, stderr) = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        kill_process_group(process)
+        process.communicate()
+        result['status'] = 'timeout'
+        return result
+
+    if process.returncode != 0:
+        result['status'] = 'error'
+        result['error'] = stderr.strip().splitlines()[-1] if stderr.strip() else 'exit code {}'.format(process.returncode)
+        return result
+
+    result.update(json.loads(stdout.strip().splitlines()[-1]))
+    return result
+
+
+def kill_process_group(process):
+    if hasattr(os, 'killpg'):
+        try:
+            os.killpg(process.pid, 9)
+            return
+        except OSError:
+            pass
+    process.kill()
+
+
+def run_instance(filename, seed, parameters):
+    """Run the genetic algorithm on an instance and measure it.
+
+    :param filename: The name of the file containing the problem instance
+    :param seed: The seed for the random number generator
+    :param parameters: The parameters of the genetic algorithm which differ from the defaults
+    :return: The result of the run (a dictionary)
+    """
+    genetic_solver.dbg = False
+    genetic_solver.set_parameters(dict(parameters, seed=seed))  # the seed of the run replaces a configured one
+    random.seed(seed)
+
+    start = time.perf_counter()
+    problem = input_parser.read_problem(filename)
+    read_time = time.perf_counter() - start
+
+    with contextlib.redirect_stdout(io.StringIO()):  # the solver reports its progress
+        best_solution = genetic_solver.solve_problem(problem)
+    wall_time = time.perf_counter() - start
+    solve_time = wall_time - read_time
+    statistics = genetic_solver.STATISTICS
+
+    result = {'status': 'ok',
+              'cost': best_solution.fit,
+              'wall_time': round(wall_time, 3),
+              'read_time': round(read_time, 3),
+              'generations': statistics['generations'],
+              'evaluations': statistics['evaluations'],
+              'generations_per_second': round(statistics['generations'] / solve_time, 3),
+              'evaluations_per_second': round(statistics['evaluations'] / solve_time, 3),
+              'rejected_initial': statistics['rejected_initial'],
+              'peak_memory_kb': None,
+              'peak_worker_memory_kb': None}
+
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux, but in bytes on macOS
+        unit = 1024 if sys.platform == 'darwin' else 1
+        result['peak_memory_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // unit
+        if genetic_solver.PARAMETERS['num_processes'] > 1 or genetic_solver.PARAMETERS['num_islands'] > 1:
+            result['peak_worker_memory_kb'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // unit
+    return result
+
+
+def format_result(result):
+    if result['status'] != 'ok':
+        return result['status'].upper() + (': ' + result['error'] if 'error' in result else '')
+
+    return 'cost={}; time={}s; generations/s={}; evaluations/s={}; peak_memory={}kB;'\
+        .format(result['cost'], result['wall_time'], result['generations_per_second'],
+                result['evaluations_per_second'], result['peak_memory_kb'])
+
+
+def compare_results(baseline, results, tolerance):
+    """Compare the results of a benchmark to the results of an earlier (baseline) benchmark.
+
+    Runs are matched by their instance and seed. A run regressed if it did not finish although it did before,
+    if its cost is higher, or if it evaluated fewer candidates per second, or needed more memory
+    (by more than the tolerance, relative to the baseline).
+    :param baseline: The baseline results
+    :param results: The new results
+    :param tolerance: The relative difference which is still acceptable
+    :return: A list of the regressions found (as readable strings)
+    """
+    baseline_runs = {(run['instance'], run['seed']): run for run in baseline['runs']}
+    regressions = []
+
+    for run in results['runs']:
+        old_run = baseline_runs.get((run['instance'], run['seed']))
+        if old_run is None or old_run['status'] != 'ok':
+            continue
+
+        name = '{} (seed {})'.format(run['instance'], run['seed'])
+        if run['status'] != 'ok':
+            regressions.append('{}: {} (baseline: ok)'.format(name, run['status']))
+            continue
+
+        # (key, whether higher values are better)
+        for (key, higher_is_better) in [('cost', False), ('evaluations_per_second', True),
+                                        ('peak_memory_kb', False)]:
+            (old_value, new_value) = (old_run.get(key), run.get(key))
+            if not old_value or new_value is None:
+                continue
+
+            change = (new_value - old_value) / old_value
+            if (change < -tolerance) if higher_is_better else (change > tolerance):
+                regressions.append('{}: {} {} (baseline: {}, {:+.1%})'.format(name, key, new_value, old_value, change))
+
+    return regressions
+
+
+if __name__ == '__main__':
+    exit_code = main()
+    sys.exit(exit_code)
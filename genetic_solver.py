@@ -1,10 +1,37 @@
 import random
 import datetime
-import copy
+import collections
+import math
+import multiprocessing
+import queue
+import time
+import itertools
+import functools
+import bisect
+import heapq
+from array import array
+import schedule_solver
 
 PARAMETERS = {'population_size': 100, 'survivor_size': 7, 'mutation_possibility': 0.0200,
-              'number_of_generations': 200, 'max_depth_start': 6, 'max_depth_increase': 3, 'max_depth': 15}
+              'number_of_generations': 200, 'max_depth_start': 6, 'max_depth_increase': 3, 'max_depth': 15,
+              'num_processes': 1, 'time_budget': None, 'profile': False,
+              'num_islands': 1, 'migration_interval': 5, 'migration_size': 2, 'migration_topology': 'ring',
+              'exact_seeds': 0, 'exact_seeding_time_limit': 10, 'initial_construction': 'random',
+              'selection': 'roulette', 'tournament_size': 3, 'day_route_cache_size': 1000,
+              'car_assignment': 'best_fit_decreasing', 'car_assignment_improvement': False,
+              'route_improvement': False, 'route_improvement_neighbours': 8,
+              'route_construction': 'nearest_neighbour', 'seed': None}
+BATCH_SIZE_PER_PROCESS = 8  # the deadline of the time budget is checked after each batch of evaluations
+STATISTICS = {'generations': 0, 'evaluations': 0, 'rejected_initial': 0}
 problem_instance = None
+tool_sizes = None       # array of the tool sizes, indexed by tool id
+empty_tool_load = None  # array of zeros, indexed by tool id
+requests_of_tool = None  # list of the requests of each tool, indexed by tool id
+customer_grid = None    # spatial index over the customer coordinates
+distance_rows = None    # the rows of the distance matrix, a plain list which is indexed directly: [from_id][to_id]
+nearest_customers = None  # the nearest customers of each customer (only if the parameter 'route_improvement' is set)
+day_route_cache = None  # the routes of single days, shared by all candidates of the process
+profiler = None         # collects the timers and counters of the phases (only if the parameter 'profile' is set)
 dbg = True
 
 
@@ -13,6 +40,81 @@ def debug_print(*args, **kwargs):
         print(*args, **kwargs)
 
 
+class NoValidCandidateError(Exception):
+    """Raised if the time budget ends before the initial population contains a single valid candidate."""
+
+
+class Profiler:
+    def __init__(self):
+        # ctor
+        # the timers are inclusive, e.g. the time of 'mutate' includes the routing of the changed days
+        # Key: name of the phase, Value: [NUMBER_OF_CALLS, SECONDS]
+        self.timers = {}
+        # Key: name of the counter, Value: count
+        self.counters = {}
+        # Key: depth limit at which a peak got repaired (or given up on), Value: number of peaks
+        self.repair_depths = {}
+        self.generations = []  # summaries of the timers and counters of the initial population and each generation
+        self.last_summary = ({}, {})
+
+    def add_time(self, phase, start):
+        """Add the time since start to the timer of the phase and count the call.
+
+        :param phase: The name of the phase
+        :param start: The value of time.perf_counter() at the start of the phase
+        :return: nothing
+        """
+        timer = self.timers.setdefault(phase, [0, 0.0])
+        timer[0] += 1
+        timer[1] += time.perf_counter() - start
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def merge(self, other):
+        """Add the timers and counters of another profiler (e.g. from a worker process) to this one.
+
+        The summaries of the generations of the other profiler (e.g. of an island) are appended to those of this one.
+        :param other: The other profiler
+        :return: nothing
+        """
+        for (phase, (calls, seconds)) in other.timers.items():
+            timer = self.timers.setdefault(phase, [0, 0.0])
+            timer[0] += calls
+            timer[1] += seconds
+        for (name, amount) in other.counters.items():
+            self.count(name, amount)
+        for (depth, amount) in other.repair_depths.items():
+            self.repair_depths[depth] = self.repair_depths.get(depth, 0) + amount
+        self.generations.extend(other.generations)
+
+    def end_generation(self, name):
+        """Store the timers and counters of the generation which just ended (i.e. the changes since the last one).
+
+        :param name: The name of the generation (e.g. 'generation 3')
+        :return: The summary of the generation
+        """
+        (last_timers, last_counters) = self.last_summary
+        summary = {'name': name, 'timers': {}, 'counters': {}}
+        for (phase, (calls, seconds)) in self.timers.items():
+            (last_calls, last_seconds) = last_timers.get(phase, (0, 0.0))
+            summary['timers'][phase] = {'calls': calls - last_calls, 'seconds': round(seconds - last_seconds, 6)}
+        for (name, amount) in self.counters.items():
+            if amount != last_counters.get(name, 0):
+                summary['counters'][name] = amount - last_counters.get(name, 0)
+
+        self.generations.append(summary)
+        self.last_summary = ({phase: tuple(timer) for (phase, timer) in self.timers.items()}, dict(self.counters))
+        return summary
+
+    def to_dict(self):
+        return {'timers': {phase: {'calls': calls, 'seconds': round(seconds, 6)}
+                           for (phase, (calls, seconds)) in self.timers.items()},
+                'counters': dict(self.counters),
+                'repair_depths': dict(sorted(self.repair_depths.items())),
+                'generations': self.generations}
+
+
 class StopOver:
     def __init__(self, customer_id, request_id, num_tools):
         self.customer_id = customer_id
@@ -28,7 +130,16 @@ class Trip:
         self.trip_distance_wo_last_stop = 0  # distance of this trip without the distance to the depot at the end
         self.stopovers = [StopOver(0, 0, 0)]  # list of requests the trip contains (0 = depot)
         self.generated_by = "nn"  # TODO
-        self.loaded_tools_per_stop = {tool_id: [0] for (tool_id, tool) in problem_instance['tools'].items()}
+
+        # the load profile of the trip, the arrays are indexed by tool id
+        # depot_load:   tools loaded at the depot (pending: grows if a later delivery needs more tools than on board)
+        # current_load: tools on board after the last stopover
+        # current_size and max_size are the summed up sizes of the tools on board after the last stopover
+        # and the maximum over all stopovers (including the depot)
+        self.depot_load = array('i', empty_tool_load)
+        self.current_load = array('i', empty_tool_load)
+        self.current_size = 0
+        self.max_size = 0
 
     def convert_from_stopovers(self, stopovers):
         #debug_print("convert_from_stopovers")
@@ -41,8 +152,8 @@ class Trip:
     def try_add(self, stopover):
 
         # 1. sum up the distance with the additional stopover
-        distance_to_stopover = problem_instance['distance'][self.stopovers[-1].customer_id][stopover.customer_id]
-        distance_to_depot    = problem_instance['distance'][stopover.customer_id]          [0]
+        distance_to_stopover = distance_rows[self.stopovers[-1].customer_id][stopover.customer_id]
+        distance_to_depot    = distance_rows[stopover.customer_id]          [0]
         sum_distances = self.trip_distance_wo_last_stop + distance_to_stopover + distance_to_depot
 
         # check if the distance is ok
@@ -50,81 +161,52 @@ class Trip:
             #debug_print("exceeded max_trip_distance")
             return False
 
-        # 2. sum up all the used tools and check if the distance is ok
+        # 2. sum up all the used tools and check if the capacity is ok
         stopover_tool_id = problem_instance['requests'][stopover.request_id].tool_id
-        new_loaded_tools_per_stop = copy.deepcopy(self.loaded_tools_per_stop)
+        tool_size = tool_sizes[stopover_tool_id]
 
         # if the new request is a fetch request, we only have to look at the changes of this stopover
         if stopover.num_tools < 0:
-            sum_load = 0
-            for (tool_id, usages) in new_loaded_tools_per_stop.items():  # add a new stopover to usages list
-                to_add = usages[-1]  # copy the amount of the last stopover
-                if tool_id == stopover_tool_id:
-                    to_add += abs(stopover.num_tools)
-
-                usages.append(to_add)
-                sum_load += to_add * problem_instance['tools'][tool_id].size
-
-            if sum_load > problem_instance['capacity']:
+            new_size = self.current_size + abs(stopover.num_tools) * tool_size
+            if new_size > problem_instance['capacity']:
                 #debug_print("exceeded capacity (fetch)")
                 return False
 
+            self.current_load[stopover_tool_id] += abs(stopover.num_tools)
+            self.current_size = new_size
+            if new_size > self.max_size:
+                self.max_size = new_size
+
         # if the new request is a deliver request (and we have to load new tools at the depot),
-        #    we have to look at all the past stopovers
+        #    the additional tools are on board for all the past stopovers, so their maximum load grows by that amount
         else:
-            tools_loaded = new_loaded_tools_per_stop[stopover_tool_id][-1]
-            to_add = stopover.num_tools - tools_loaded
+            to_add = stopover.num_tools - self.current_load[stopover_tool_id]
             if to_add <= 0:
                 to_add = 0  # we have enough tools loaded, so we do not need to load more tools!
 
-            # update the past days, if we had to load something at the depot
-            if to_add > 0:
-                for stopover_idx in range(len(self.stopovers)):  # loop over all days
-                    new_loaded_tools_per_stop[stopover_tool_id][stopover_idx] += to_add
+            if (self.max_size + to_add * tool_size) > problem_instance['capacity']:
+                #debug_print("exceeded capacity (deliver)")
+                return False
 
-            for (tool_id, usages) in new_loaded_tools_per_stop.items():  # add a new day to usages list
-                if tool_id == stopover_tool_id:  # now we have to deliver the tools
-                    usages.append(usages[-1] - stopover.num_tools)
-                else:
-                    usages.append(usages[-1])
-
-            # if we had to add tools at the depot, we have to check the capacity of the past stopovers
-            if to_add > 0:
-                for stopover_idx in range(len(self.stopovers) + 1):  # loop over all days (+1, since we added a new one)
-                    sum_load = 0
-                    for (tool_id, usages) in new_loaded_tools_per_stop.items():
-                        sum_load += usages[stopover_idx] * problem_instance['tools'][tool_id].size
-                    if sum_load > problem_instance['capacity']:
-                        #debug_print("exceeded capacity (deliver)")
-                        return False
-
-        # TODO Could be removed, just tests if we did something wrong
-        for stopover_idx in range(len(self.stopovers) + 1):
-            sum_ = 0
-            for (tool_id, usages) in new_loaded_tools_per_stop.items():
-                sum_ += usages[stopover_idx] * problem_instance['tools'][tool_id].size
-            if sum_ > problem_instance['capacity']:
-                debug_print("UNDETECTED CAPACITY PROBLEM!")
-
-        # 3. if we get here, we can add the new stop, and update the trip distance and the used tools
+            self.depot_load[stopover_tool_id] += to_add
+            self.current_load[stopover_tool_id] += to_add - stopover.num_tools
+            self.max_size += to_add * tool_size
+            self.current_size += (to_add - stopover.num_tools) * tool_size
+
+        # 3. if we get here, we can add the new stop and update the trip distance
         self.stopovers.append(stopover)
         self.trip_distance_wo_last_stop += distance_to_stopover
-        self.loaded_tools_per_stop = new_loaded_tools_per_stop
         return True
 
     def finalize(self):
         # set complete distance
         last_stop_customer_id = self.stopovers[-1].customer_id
-        self.distance = self.trip_distance_wo_last_stop + problem_instance['distance'][last_stop_customer_id][0]
+        self.distance = self.trip_distance_wo_last_stop + distance_rows[last_stop_customer_id][0]
 
         # update stopovers (return to the depot)
         if self.stopovers[-1].customer_id != 0:
             self.stopovers.append(StopOver(0, 0, 0))
 
-        # update tool usages for the last day
-        for (tool_id, usages) in self.loaded_tools_per_stop.items():
-            usages.append(usages[-1])
-
     def __str__(self):
         to_string = "Trip: \n"
         for stopover in self.stopovers:
@@ -132,397 +214,274 @@ class Trip:
         return to_string
 
 
+class CustomerGrid:
+    def __init__(self, customers):
+        # ctor
+        # bucket grid over the customer coordinates, built once per problem instance
+        # the cells are chosen such that there are about two customers per cell
+        self.min_x = min(customer.x for customer in customers.values())
+        self.min_y = min(customer.y for customer in customers.values())
+        width  = max(customer.x for customer in customers.values()) - self.min_x + 1
+        height = max(customer.y for customer in customers.values()) - self.min_y + 1
+        self.cell_size = max(1, math.ceil(math.sqrt(2 * width * height / len(customers))))
+        self.num_cells_x = (width  // self.cell_size) + 1
+        self.num_cells_y = (height // self.cell_size) + 1
+        self.cell_of_customer = {customer_id: ((customer.x - self.min_x) // self.cell_size,
+                                               (customer.y - self.min_y) // self.cell_size)
+                                 for (customer_id, customer) in customers.items()}
+
+    def cells_in_ring(self, cell, radius):
+        """Generate the cells whose chebyshev distance to the given cell equals the radius.
+
+        :param cell: The (X, Y) index of the center cell
+        :param radius: The distance of the ring to the center cell (in cells)
+        :return: A generator of (X, Y) indices (may lie outside of the grid)
+        """
+        (cell_x, cell_y) = cell
+        if radius == 0:
+            yield cell
+            return
+
+        for x in range(cell_x - radius, cell_x + radius + 1):
+            yield (x, cell_y - radius)
+            yield (x, cell_y + radius)
+        for y in range(cell_y - radius + 1, cell_y + radius):
+            yield (cell_x - radius, y)
+            yield (cell_x + radius, y)
+
+
+class PendingRequests:
+    # below this number of pending requests, a linear scan is cheaper than searching the (mostly empty) grid
+    LINEAR_SCAN_LIMIT = 16
+
+    def __init__(self, requests):
+        # ctor
+        # requests: iterable of (REQUEST_ID, CUSTOMER_ID) pairs
+        # the rank of a request (its position) is used to break ties between equally distant requests
+        self.buckets = {}
+        self.entries = {}
+        for (rank, (req_id, customer_id)) in enumerate(requests):
+            cell = customer_grid.cell_of_customer[customer_id]
+            entry = (rank, req_id, customer_id)
+            self.buckets.setdefault(cell, []).append(entry)
+            self.entries[req_id] = (cell, entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def pop_nearest(self, customer_id):
+        """Remove the pending request which is the nearest to the given customer and return its ID.
+
+        Of several requests with the same distance, the one with the lowest rank is chosen.
+        :param customer_id: The customer from which to measure the distances
+        :return: The ID of the nearest request
+        """
+        distances = distance_rows[customer_id]
+        best = None  # (DISTANCE, RANK, REQUEST_ID)
+
+        if len(self.entries) <= self.LINEAR_SCAN_LIMIT:
+            for entries in self.buckets.values():
+                for (rank, req_id, req_customer_id) in entries:
+                    if (best is None) or ((distances[req_customer_id], rank) < best[:2]):
+                        best = (distances[req_customer_id], rank, req_id)
+
+        else:
+            # search the rings of cells around the customer, until no cell further away could hold a closer request:
+            # a request in ring R is at least (R - 1) * cell_size away, i.e. its (floored) distance cannot be
+            # lower than the best one found so far, once (R - 1) * cell_size >= best distance + 1
+            center = customer_grid.cell_of_customer[customer_id]
+            max_radius = max(customer_grid.num_cells_x, customer_grid.num_cells_y)
+            radius = 0
+            while radius <= max_radius:
+                if (best is not None) and ((radius - 1) * customer_grid.cell_size >= best[0] + 1):
+                    break
+
+                for cell in customer_grid.cells_in_ring(center, radius):
+                    for (rank, req_id, req_customer_id) in self.buckets.get(cell, ()):
+                        if (best is None) or ((distances[req_customer_id], rank) < best[:2]):
+                            best = (distances[req_customer_id], rank, req_id)
+                radius += 1
+
+        nearest_req_id = best[2]
+        (cell, entry) = self.entries.pop(nearest_req_id)
+        bucket = self.buckets[cell]
+        bucket.remove(entry)
+        if not bucket:
+            del self.buckets[cell]
+
+        return nearest_req_id
+
+
 class Candidate:
-    def __init__(self, day_list, fitness_=None):
+    def __init__(self, start_days, fitness_=None):
         # ctor
-        self.day_list = day_list
+        # the chromosome: an array with the chosen start day of each request, indexed by request id
+        # (index 0 is unused); the day-list is derived from it only when needed
+        self.start_days = start_days
         self.valid = True  # gets set in repair()
         self.fit = -1
+        self.cars_on_day = None  # gets set in fitness_heuristic(), together with the other per-day caches
+        self.num_cars_on_day = None
         return
 
+    def __getstate__(self):
+        # only the per-day costs are sent between processes, not the routes (which make up most of the pickle);
+        # routes which are needed (e.g. for the solution file) are rebuilt by fitness_heuristic()
+        # the usages are derived from the start days whenever the fitness is updated
+        state = dict(self.__dict__)
+        state['cars_on_day'] = None
+        state['usages_min'] = None
+        state['usages_max'] = None
+        return state
+
     def __str__(self):
         return 'CANDIDATE (' + str(self.fit) + '): ' + str(self.day_list)
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            return self.day_list == other.day_list
+            return self.start_days == other.start_days
         return False
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
-    def get_tool_usages(self):
+    @property
+    def day_list(self):
+        """The day-list of the candidate, derived from the start days of the requests.
+
+        The day-list is not stored, so every access creates it anew.
+        """
+        return day_list_from_start_days(self.start_days)
+
+    def fitness_heuristic(self):
+        """Calculate the fitness (i.e. the cost) of the candidate from scratch.
+
+        The routes of every day are cached on the candidate, such that update_fitness can later
+        re-evaluate the candidate by only rebuilding the days which changed.
+        If the candidate is found to be invalid, its valid field is set to False.
+        :return: The fitness of the candidate, or -1 if it is not valid
+        """
+        num_days = problem_instance['days']
+        self.cars_on_day = [[] for _ in range(num_days)]
+        self.num_cars_on_day = [0 for _ in range(num_days)]
+        self.distance_on_day = [0 for _ in range(num_days)]
+        self.tool_peaks_on_day = [{} for _ in range(num_days)]
+        self.critical_context_on_day = [() for _ in range(num_days)]
+        self.sum_cars = 0
+        self.sum_distance = 0
+
+        # first, get the 1) optimistic minimum of tools needed per day and 2) the maximum of tools needed per day
         day_list = self.day_list
-        # usage:
-        # Key:   TOOL ID
-        # Value: List of length = len(day_list),
-        #         each index has a dictionary with two entries: min and max
-        #         min denotes how many tools are minimally required at that day -
-        #         by fetching tools and delivering them on the same day
-        usage = {}
-        for tool_id in problem_instance['tools'].keys():
-            usage[tool_id] = [{'min': 0, 'max': 0} for _ in day_list]
-
-        # walk through every day
-        for (idx, req_dict) in enumerate(day_list):
-
-            # for each day, walk through every request on that day
-            for (req_id, req_state) in req_dict.items():
-
-                # calculate the variables that we need
-                request = problem_instance['requests'][req_id]
-                tool_id = request.tool_id
-                delivery_amount = 0
-                fetch_amount = 0
-
-                # if it's the beginning of the request (i.e. delivery), add to the delivery amount
-                # else to the fetch amount
-                if req_state == 'deliver':
-                    delivery_amount = request.num_tools
-                else:
-                    fetch_amount = request.num_tools
+        (self.usages_min, self.usages_max) = tool_usages_from_start_days(self.start_days)
 
-                # min = assuming that we are lucky, we can fetch tools and directly deliver them to another customer
-                usage[tool_id][idx]['min'] += (delivery_amount - fetch_amount)
-                usage[tool_id][idx]['max'] += delivery_amount
+        for day_index in range(num_days):
+            if not self.plan_day(day_index, day_list[day_index]):
+                self.valid = False
+                return -1
 
-            # don't forget to take those tools into account which are still at a customer's place
-            for tool_id in problem_instance['tools'].keys():
-                if idx > 0:
-                    usage[tool_id][idx]['min'] += usage[tool_id][idx - 1]['min']
-                    # add min in both cases (because on the next day, all the tools we fetched are at the depot!)
-                    usage[tool_id][idx]['max'] += usage[tool_id][idx - 1]['min']
+        return self.get_total_cost()
 
-        return usage
+    def update_fitness(self, changed_days):
+        """Re-calculate the fitness of the candidate after the requests on some days have changed.
 
-    def fitness_heuristic(self):
-        cars_on_day = [[] for _ in range(problem_instance['days'])]
+        Only the changed days and those days whose critical tools have changed (because tools are at
+        a customer's place for a different time) are routed again, all other days are taken from the cache.
+        If the candidate has not been evaluated before, the whole fitness is calculated.
+        Without the routes of the other days (see __getstate__), only the per-day costs are updated.
+        :param changed_days: The indices of the days whose requests have changed
+        :return: The fitness of the candidate, or -1 if it is not valid
+        """
+        if not self.valid or self.num_cars_on_day is None:
+            return self.fitness_heuristic()
 
-        # first, get the 1) optimistic minimum of tools needed per day and 2) the maximum of tools needed per day
-        usages = self.get_tool_usages()
-        trips_per_day = {}
-
-        # check if we can use NN heuristic
-        # we can only use NN if FOR ALL TOOLS on this day this holds: (usages[tool][day][max] <= num_tools)
-        # otherwise we must make sure to fetch the tools before delivering them to not exceed the limit
-
-        for (day_index, requests_on_day) in enumerate(self.day_list):
-            tsp_per_day = []
-
-            trips_per_day[day_index] = []
-            trips_today = trips_per_day[day_index]
-
-            # 1. find critical tools for this day
-            critical_tools = []
-            for (tool_id, tool) in problem_instance['tools'].items():
-                if usages[tool_id][day_index]['max'] > tool.num_available:
-                    critical_tools.append(tool_id)
-
-            # 2. loop over critical tools, make tsp for critical requests
-            for critical_tool_id in critical_tools:
-                # how many additional tools compared to the previous day are available?
-                diff_deliver_fetch = usages[critical_tool_id][day_index]['min'] if day_index == 0 else \
-                    usages[critical_tool_id][day_index]['min'] - usages[critical_tool_id][day_index - 1]['min']
-
-                # how much wiggle room do we have for this day?
-                wiggle_room = problem_instance['tools'][critical_tool_id].num_available - \
-                              usages[critical_tool_id][day_index]['min']
-
-                # filter requests which contain a critical tool with this id
-                critical_requests_deliver = [req_id for req_id, req_status in requests_on_day.items()
-                                           if (problem_instance['requests'][req_id].tool_id == critical_tool_id) and
-                                           (req_status == 'deliver')]
-
-                critical_requests_fetch   = [req_id for req_id, req_status in requests_on_day.items()
-                                           if (problem_instance['requests'][req_id].tool_id == critical_tool_id) and
-                                           (req_status == 'fetch')]
-
-                # while len(critical_requests_deliver) + len(critical_requests_fetch) > 0:
-                # constraints:
-                # 1. sum distance per car < max distance
-                # 2. -sum(fetch) + sum(deliver) = additional tools
-                #  this means for diff_deliver_fetch > 0, we load tools when leaving the depot, and return WITHOUT tools
-                #  and for diff_deliver_fetch < 0, we do NOT load tools when leaving the depot, but return with tools
-
-                # we need to fetch first, then deliver
-
-                # order critical requests by amount, highest amount first
-                critical_request_deliver_sorted = sorted(critical_requests_deliver,
-                                                         key=lambda x: problem_instance['requests'][x].num_tools,
-                                                         reverse=True)
-
-                already_used_deliveries = []
-                not_yet_used_deliveries = critical_request_deliver_sorted.copy()
-
-                # set request at the end of the route
-                for req_deliver_id in critical_request_deliver_sorted:
-
-                    # this should not occur unless we added more delivery requests
-                    # to the last trip (see below)
-                    if req_deliver_id in already_used_deliveries:
-                        continue
-                    already_used_deliveries.append(req_deliver_id)
-                    not_yet_used_deliveries.remove(req_deliver_id)
-
-                    req_deliver_customer_id = problem_instance['requests'][req_deliver_id].customer_id
-                    req_deliver_num_tools   = problem_instance['requests'][req_deliver_id].num_tools
-                    fetch_counter            = 0
-                    successful_fetch_counter = 0
-
-                    # we start at the depot
-                    route = []
-                    start_at_depot = StopOver(0, 0, 0)
-                    route.append(start_at_depot)
-
-                    if critical_requests_fetch:
-                        # calculate the metric, based on which we determine the fetch request to pick next
-                        # metric = scaled DISTANCE x scaled DELTA
-                        # where by distance we mean distance from current delivery request to the delivery request
-                        #          delta: the amount of tools we fetch - tools we deliver
-                        distances = {}
-                        deltas = {}
-                        for req_id in critical_requests_fetch:
-                            req_fetch_customer_id = problem_instance["requests"][req_id].customer_id
-                            dist_to_deliver = problem_instance["distance"][req_deliver_customer_id][req_fetch_customer_id]
-
-                            # if we already have one or more fetch requests used, we need the third to last item
-                            # (second to last being the deliver and last being the depot)
-                            # otherwise, we want the depot
-                            if successful_fetch_counter > 0:
-                                last_stopover_customer_id = route[-3].customer_id
-                                dist_to_last_stopover = problem_instance["distance"][req_deliver_customer_id][last_stopover_customer_id]
-                            else:
-                                dist_to_last_stopover = problem_instance["distance"][req_deliver_customer_id][0]
-
-                            # we take the distance from the last fetch stopover (might be the depot)
-                            # to the critical request and on to the deliver request
-                            dist = dist_to_last_stopover + dist_to_deliver
-                            delta = abs(problem_instance["requests"][req_fetch_customer_id].num_tools
-                                        - req_deliver_num_tools)
-
-                            distances[req_id] = dist
-                            deltas[req_id] = delta
-
-                        min_dist  = min(distances.items(), key=lambda x: x[1])[1]
-                        max_dist  = max(distances.items(), key=lambda x: x[1])[1]
-                        min_delta = min(deltas.items(),    key=lambda x: x[1])[1]
-                        max_delta = max(deltas.items(),    key=lambda x: x[1])[1]
-
-                        # try to fill the route with other requests before the deliver request
-                        # a request fits if the delta between the num_tools is low and the distance is low
-                        requests_with_metric = {}
-                        for req_fetch_id in critical_requests_fetch:
-                            req_fetch_customer_id = problem_instance["requests"][req_fetch_id].customer_id
-                            req_fetch_distance = problem_instance['distance'][req_deliver_customer_id][req_fetch_customer_id]
-                            req_fetch_delta = problem_instance['requests'][req_fetch_id].num_tools
-
-                            # distance is mapped to a range from 1 - 4
-                            # delta is mapped to a range from 1 - 10
-                            # because we want to focus more on the range than the distance
-                            score_distance = translate(req_fetch_distance, min_dist, max_dist, 1, 4)
-                            score_delta = translate(req_fetch_delta, min_delta, max_delta, 1, 10)
-                            score = score_distance * score_delta
-                            requests_with_metric[req_fetch_id] = score
-
-                        sorted_requests = sorted(requests_with_metric.items(), key=lambda x: x[1])
-
-                        # add requests to the list (to keep this simple, all fetch req. are before deliver req.)
-                        for (fetch_req_id, fetch_req_score) in sorted_requests:
-
-                            # check if the distance is shorter than the max distance per car
-                            fetch_customer_id = problem_instance['requests'][fetch_req_id].customer_id
-                            fetch_num_tools   = problem_instance['requests'][fetch_req_id].num_tools
-
-                            tmp_route = route.copy()
-
-                            # add the (CUSTOMER_ID, REQUEST_ID) tuples to the tmp route
-                            if successful_fetch_counter > 0:
-                                # pretty stupid fix
-                                # but otherwise we would append the delivery and depot each time
-                                # that we append a new fetch
-                                tmp_route.pop()
-                                tmp_route.pop()
-
-                            neg_fetch_num_tools = (-1) * abs(fetch_num_tools)
-                            tmp_route.append(StopOver(fetch_customer_id, fetch_req_id, neg_fetch_num_tools))
-                            tmp_route.append(StopOver(req_deliver_customer_id, req_deliver_id, req_deliver_num_tools))
-                            tmp_route.append(StopOver(0, 0, 0))
-
-                            fetch_counter += 1
-                            successful_move = is_route_valid(tmp_route, critical_tool_id)
-                            if successful_move:
-                                # we used this fetch request up and cannot re-use it in
-                                # further delivery requests
-                                critical_requests_fetch.remove(fetch_req_id)
-                                route = tmp_route
-                                tools_returned_to_depot = tmp_route[-1].num_tools
-                                successful_fetch_counter += 1
-
-                                # if we found some route that fetches more than delivers,
-                                # we're just gonna stop building up this route
-                                if tools_returned_to_depot >= 0:
-                                    # TODO we could try to add another delivery request and re-do the sorted_requests
-                                    #      loop though this probably won't make much sense for 1 or 2 tools
-                                    #      we might need to define some border at which this behaviour gets triggered
-                                    break
-
-                    if fetch_counter <= 0:
-                        # if there weren't any fetch requests left, we're just gonna
-                        # try to deliver and return to depot
-                        route.append(StopOver(req_deliver_customer_id, req_deliver_id, req_deliver_num_tools))
-                        route.append(StopOver(0, 0, 0))
-
-                    #debug_print("PRE:", [str(so) for so in route], end="\n")
-                    route_valid = is_route_valid(route, critical_tool_id)
-                    #debug_print("POST:", [str(so) for so in route], end="\n\n")
-                    if route_valid:
-                        trip = Trip()
-                        trip.generated_by = "sfad"
-                        trip.convert_from_stopovers(route)
-                        trip.generated_by = "sfad"
-                        trips_today.append(trip)
-                    else:
-                        # at this point, I think we should just cancel this thing
-                        #debug_print("THE ROUTE SEEMS TO BE INVALID?")
-                        self.valid = False
-                        return -1
-
-                # at this point, we have used up all deliver requests
-                # but there were some fetch requests that were not yet used
-                # so we'll just try to do a NN with them
-                if critical_requests_fetch:
-                    for req_fetch_crit_id in critical_requests_fetch:
-                        # TODO it's a shame how these fetch requests go to waste
-                        # TODO could have made better use of them with a nearest neighbour
-                        crit_fetch_req = problem_instance["requests"][req_fetch_crit_id]
-                        route = []
-
-                        neg_fetch_req_num_tools = abs(crit_fetch_req.num_tools) * (-1)
-                        route.append(StopOver(0, 0, 0))
-                        route.append(StopOver(crit_fetch_req.customer_id, crit_fetch_req.id, neg_fetch_req_num_tools))
-                        route.append(StopOver(0, 0, 0))
-
-                        route_valid = is_route_valid(route, critical_tool_id)
-                        if route_valid:
-                            trip = Trip()
-                            trip.generated_by = "sfad"
-                            trip.convert_from_stopovers(route)
-                            trip.generated_by = "sfad"
-                            trips_today.append(trip)
-                        else:
-                            debug_print("For some reason, could not fulfill the single fetch")
-                            self.valid = False
-                            return -1
-
-                # after we have allocated all requests on that day, let's sum up how many
-                # tools we "wasted" (i.e. brought to the depot without further using them)
-                unused_tools = 0
-                for trip in trips_today:
-                    unused_tools += trip.loaded_tools_per_stop[critical_tool_id][-1]
-
-                available = problem_instance["tools"][critical_tool_id].num_available
-                opt_max = usages[critical_tool_id][day_index]['min']
-                actual_usage = unused_tools + opt_max
-                if actual_usage > available:
-                    #debug_print("THE WIGGLE ROOM WAS EXHAUSTED")
+        day_list = self.day_list
+        (self.usages_min, self.usages_max) = tool_usages_from_start_days(self.start_days)
+
+        for day_index in range(problem_instance['days']):
+            if (day_index in changed_days) or \
+                    (self.critical_context_on_day[day_index] != self.get_critical_context(day_index)):
+
+                # remove the old routes of the day from the global sums, before building them anew
+                self.sum_cars     -= self.num_cars_on_day[day_index]
+                self.sum_distance -= self.distance_on_day[day_index]
+                if not self.plan_day(day_index, day_list[day_index]):
                     self.valid = False
                     return -1
 
-            # 3. loop over remaining (non critical) requests, use NN heuristic
-            # 3.1 get all critical requests
-            non_critical_requests = {req_id: req_status for (req_id, req_status) in requests_on_day.items()
-                                        if problem_instance['requests'][req_id].tool_id not in critical_tools}
-
-            current_trip = Trip()
-            # just loop while we still have requests to to
-            while non_critical_requests:
-                # sort them (based on their distance to the last point in the trip)
-                last_stopover_customer_id = current_trip.stopovers[-1].customer_id
-
-                non_critical_requests_sorted = sorted(non_critical_requests.items(),
-                    key=lambda x: problem_instance['distance']
-                        [last_stopover_customer_id][problem_instance['requests'][x[0]].customer_id])
-
-                # create a new stopover for the nearest neighbour (a stopover needs customer_id, request_id, num_tools)
-                nn_req_id = non_critical_requests_sorted[0][0]
-                nn_req_status = non_critical_requests_sorted[0][1]
-                nn_customer_id = problem_instance['requests'][nn_req_id].customer_id
-                nn_num_tools = problem_instance['requests'][nn_req_id].num_tools
-                if nn_req_status == 'fetch':
-                    nn_num_tools *= -1
-                nn_stopover = StopOver(nn_customer_id, nn_req_id, nn_num_tools)
-
-                if not current_trip.try_add(nn_stopover):  # trip is full
-                    current_trip.finalize()
-                    trips_today.append(current_trip)  # finalize the trip
-                    current_trip = Trip()  # reset the current_trip
-                    current_trip.try_add(nn_stopover)  # the first stop can never fail, unless our problem instance is faulty
-
-                non_critical_requests.pop(nn_req_id, None)  # remove the request from the list of requests yet to assign
+        return self.get_total_cost()
 
-            current_trip.finalize()
-            trips_today.append(current_trip)  # add the last trip to the array
+    def get_critical_context(self, day_index):
+        """Find the critical tools of a day, i.e. the tools whose pessimistic maximum exceeds the availability.
 
-            # loop over trips, assign them to cars
-            car_idx = 0
-            sum_distance_car = 0
-            cars = [[]]  # list of cars with list of trips inside
-            for trip in trips_today:
-                if (sum_distance_car + trip.distance) > problem_instance['max_trip_distance']:
-                    cars.append([])
-                    car_idx += 1
-                    sum_distance_car = 0
+        The routes of a day only depend on the requests of the day and on the result of this function.
+        :param day_index: The index of the day
+        :return: A tuple of pairs (TOOL_ID, OPTIMISTIC_MAXIMUM) for each critical tool
+        """
+        return tuple((tool_id, self.usages_min[tool_id][day_index])
+                     for (tool_id, tool) in problem_instance['tools'].items()
+                     if self.usages_max[tool_id][day_index] > tool.num_available)
+
+    def plan_day(self, day_index, requests_on_day):
+        """Plan a single day, i.e. build its routes and assign them to cars (see route_day).
+
+        If a day with the same requests and the same critical context has been planned before (by any candidate),
+        its routes are taken from the day route cache.
+        The cars, the driven distance and the additionally needed tools of the day are stored
+        in the per-day caches of the candidate, and the global sums are updated.
+        :param day_index: The index of the day to plan
+        :param requests_on_day: The entry of the day-list for this day
+        :return: True if the day could be planned, False otherwise
+        """
+        critical_context = self.get_critical_context(day_index)
+        if day_route_cache is None:
+            routes = route_day(requests_on_day, critical_context)
+        else:
+            # the requests of a day are ordered by their ID (see day_list_from_start_days)
+            key = (tuple(requests_on_day.items()), critical_context)
+            routes = day_route_cache.get(key)
+            if routes is None:
+                routes = route_day(requests_on_day, critical_context)
+                day_route_cache.put(key, routes)
+
+        if routes is False:
+            return False
 
-                cars[car_idx].append(trip)  # append trip to car
-                sum_distance_car += trip.distance
+        (cars, distance_day, max_tools_used_on_day) = routes
+        if self.cars_on_day is not None:
+            self.cars_on_day[day_index] = cars
+        self.num_cars_on_day[day_index] = len(cars)
+        self.critical_context_on_day[day_index] = critical_context
+        self.distance_on_day[day_index] = distance_day
+        self.tool_peaks_on_day[day_index] = max_tools_used_on_day
+        self.sum_cars     += len(cars)
+        self.sum_distance += distance_day
+        return True
 
-            cars_on_day[day_index] = cars
-            # 4. Now we have calculated all TSPs of this day
-            # we can calculate the fitness, update max_tools nedded
+    def get_total_cost(self):
+        """Sum up the cost of the candidate from the per-day caches.
 
+        :return: The fitness of the candidate
+        """
         # 5. All TSPs of all cars have been generated.
-        # sum up the cars, get max_cars, sum up distance
+        # get max_cars, the sums of cars and distance are kept up to date by plan_day
+        max_cars = max(self.num_cars_on_day)
 
-        max_cars = 0
-        sum_cars = 0
-        sum_distance = 0
         max_tools_used = {tool_id: 0 for (tool_id, _) in problem_instance['tools'].items()}
-        for (day_idx, cars_day) in enumerate(cars_on_day):
-
-            if day_idx == 0:  # on the first day, we havn't used tools previously (obviously)
-                max_tools_used_on_day = {tool_id: 0 for (tool_id, _) in problem_instance['tools'].items()}
-            else:  # start with the min tools used from the previous day
-                max_tools_used_on_day = {tool_id: usages[day_idx - 1]['min'] for (tool_id, usages) in usages.items()}
-
-            sum_cars += len(cars_day)
-            if len(cars_day) > max_cars:
-                max_cars = len(cars_day)
-
-            for (car_idx, car) in enumerate(cars_day):
-                max_additional_tools_car = {tool_id: 0 for (tool_id, _) in problem_instance['tools'].items()}
-                currently_used_tools_car = {tool_id: 0 for (tool_id, _) in problem_instance['tools'].items()}
-                for trip in car:
-                    for (tool_id, _) in problem_instance['tools'].items():
-                        # add all the stuff we load at the depot (first stop of the trip)
-                        currently_used_tools_car[tool_id] += trip.loaded_tools_per_stop[tool_id][0]
-                        if currently_used_tools_car[tool_id] > max_additional_tools_car[tool_id]:
-                            max_additional_tools_car[tool_id] = currently_used_tools_car[tool_id]
-                        # subtract what we bring back to the depot (last stop of the trip)
-                        currently_used_tools_car[tool_id] -= trip.loaded_tools_per_stop[tool_id][-1]
-
-                    sum_distance += trip.distance
-
-                for (tool_id, _) in problem_instance['tools'].items():
-                    max_tools_used_on_day[tool_id] += max_additional_tools_car[tool_id]
-
-            # check if the max amount of tools is bigger on this day
+        for (day_idx, tool_peaks) in enumerate(self.tool_peaks_on_day):
             for (tool_id, max_amount) in max_tools_used.items():
-                if max_tools_used_on_day[tool_id] > max_amount:
-                    max_tools_used[tool_id] = max_tools_used_on_day[tool_id]
+                # start with the min tools used from the previous day
+                # (on the first day, we havn't used tools previously (obviously))
+                max_tools_used_on_day = tool_peaks[tool_id]
+                if day_idx > 0:
+                    max_tools_used_on_day += self.usages_min[tool_id][day_idx - 1]
+
+                # check if the max amount of tools is bigger on this day
+                if max_tools_used_on_day > max_amount:
+                    max_tools_used[tool_id] = max_tools_used_on_day
 
         #debug_print(max_cars)
-        #debug_print(sum_cars)
-        #debug_print(sum_distance)
+        #debug_print(self.sum_cars)
+        #debug_print(self.sum_distance)
         #debug_print(max_tools_used)
 
         # sum up tool costs
@@ -530,25 +489,25 @@ class Candidate:
         for (tool_id, max_amount) in max_tools_used.items():
             sum_tool_costs += max_amount * problem_instance['tools'][tool_id].cost
 
-        self.cars_on_day = cars_on_day
-        #debug_print(cars_on_day)
-
-        return max_cars     * problem_instance['vehicle_cost']     + \
-               sum_cars     * problem_instance['vehicle_day_cost'] + \
-               sum_distance * problem_instance['distance_cost']    + \
+        return max_cars          * problem_instance['vehicle_cost']     + \
+               self.sum_cars     * problem_instance['vehicle_day_cost'] + \
+               self.sum_distance * problem_instance['distance_cost']    + \
                sum_tool_costs
 
-    def mutate(self):
+    def mutate(self, rng=random):
         """Perform a random mutation on the current candidate.
 
+        :param rng: The random number generator to draw from (defaults to the random module)
         :return:
         """
 
-        r = random.random()
+        r = rng.random()
         if r < PARAMETERS['mutation_possibility']:
+            if profiler is not None:
+                profiler.count('mutations')
 
             while True: # find a request to mutate where first start day != last start day
-                request_id = random.randrange(1, len(problem_instance['requests']) + 1)
+                request_id = rng.randrange(1, len(problem_instance['requests']) + 1)
                 first_day = problem_instance['requests'][request_id].first_day
                 last_day  = problem_instance['requests'][request_id].last_day
                 num_days  = problem_instance['requests'][request_id].num_days
@@ -557,49 +516,18 @@ class Candidate:
                     break
 
             while True: # find a new start day
-                new_start_day = random.randrange(first_day, last_day + 1)
-                old_start_day = self.find_start_day_of_request(request_id, first_day, last_day)
-
-                if new_start_day != old_start_day: # change the startday and endday of the request
-                    self.day_list[new_start_day]           [request_id] = 'deliver'
-                    self.day_list[new_start_day + num_days][request_id] = 'fetch'
-                    self.day_list[old_start_day]           .pop(request_id, None)
-                    self.day_list[old_start_day + num_days].pop(request_id, None)
-                    break
+                new_start_day = rng.randrange(first_day, last_day + 1)
+                old_start_day = self.start_days[request_id]
 
-    def find_start_day_of_request(self, request_id, first_day, last_day):
-        """Find the chosen start day of the request for this candidate.
-
-        :param request_id: The ID of the request whose chosen start day to find
-        :param first_day: The first possible start day of the request as per problem instance
-        :param last_day: The last possible start day of the request as per problem instance
-        :return: The index of the day on which the start was fixed or -1
-        """
-        for day_idx in range(first_day, last_day + 1):
-            if request_id in self.day_list:
-                return day_idx
-
-        return -1
+                if new_start_day != old_start_day: # change the startday (and thus the endday) of the request
+                    self.start_days[request_id] = new_start_day
+                    break
 
-    def get_extended_daylist(self):
-        """Create the extended day-list of the candidate.
-
-        Creates a list of length NUMBER_DAYS, where every element is a dictionary {REQUEST_ID: REQUEST_STATE}.
-        This extends the normal day-list by adding {REQUEST_ID: "running"} entries between start and end days.
-        :return: The extended day-list
-        """
-        new_daylist = [{} for _ in range(problem_instance['days'])]
-        for (day_idx, requests_on_day) in enumerate(self.day_list):
-            new_daylist[day_idx].update(requests_on_day)
-            if day_idx != 0:
-                # append all the elems from the last day, which do not have the value 'fetch'
-                # and are not on the current day (so they are still running)
-                new_daylist[day_idx].update({key: 'running'
-                                             for (key, value)
-                                             in new_daylist[day_idx - 1].items()
-                                             if (value != 'fetch') and not (key in requests_on_day)})
-
-        return new_daylist
+            # only the days on which the request started or ended have to be routed again
+            # (if the candidate has been evaluated before)
+            if self.fit != -1:
+                changed_days = {old_start_day, old_start_day + num_days, new_start_day, new_start_day + num_days}
+                self.fit = self.update_fitness(changed_days)
 
     def repair(self):
         """Repair the Candidate's request schedule.
@@ -613,48 +541,47 @@ class Candidate:
         Otherwise, the valid field of the Candidate is set to False.
         :return: nothing
         """
-        usages = self.get_tool_usages()
-        extended_day_list = self.get_extended_daylist()
-
-        for (tool_id, usages_per_day) in usages.items():
-            indexed_usages_per_day = enumerate(usages_per_day)
-            (day_idx, peak_amount) = max(indexed_usages_per_day, key=lambda x: x[1]['min'])
+        # the moves are made on a copy of the start days
+        start_days = array('h', self.start_days)
+        (usages_min, _) = tool_usages_from_start_days(start_days)
+
+        for tool_id in problem_instance['tools']:
+            usages_per_day = usages_min[tool_id]
+            peak_amount = max(usages_per_day)
+            day_idx = usages_per_day.index(peak_amount)
             tool_availability = problem_instance["tools"][tool_id].num_available
 
             # if the peak does not exceed the availability of the tool, we can ignore it :)
-            if peak_amount['min'] <= tool_availability:
+            if peak_amount <= tool_availability:
                 continue
 
-            # possibly involved requests:
-            # all requests on the peak day
-            possibly_involved_requests = extended_day_list[day_idx]
-            involved_requests = []
-            start_day_dict = {}
-
             # calculate the involved requests:
-            # those, which are DELIVER or RUNNING
-            # and actually request the wanted tool
-            for req_id in possibly_involved_requests.keys():
-                req_state = possibly_involved_requests[req_id]
-
-                if req_state == "deliver" or req_state == "running":
-                    req = problem_instance["requests"][req_id]
+            # those, which actually request the wanted tool and are delivered or running on the peak day,
+            # and their possible start positions
+            start_day_dict = {}
+            for request in requests_of_tool[tool_id]:
+                if start_days[request.id] <= day_idx < start_days[request.id] + request.num_days:
+                    start_day_dict[request.id] = list(range(request.first_day, request.last_day + 1))
 
-                    if req.tool_id == tool_id:
-                        involved_requests.append(req)
+            # the usages of the tool as a difference array, which every move updates in constant time
+            usage_changes = [0] * (problem_instance['days'] + 1)
+            for request in requests_of_tool[tool_id]:
+                add_usage_changes(usage_changes, request, start_days[request.id], 1)
 
-            # calculate the possible start positions of the requests...
-            for request in involved_requests:
-                first_start_day = request.first_day
-                last_start_day = request.last_day
-                start_day_dict[request.id] = list(range(first_start_day, last_start_day + 1))
+            # the requests moved on the current path of the search, and the moves made (to revert them)
+            moved = set()
+            undo_log = []
 
+            if profiler is not None:
+                profiler.count('repaired_peaks')
             max_depth = PARAMETERS['max_depth_start']
             while True:
                 #debug_print("max_depth:", max_depth)
-                repair_result = self.rec_repair(start_day_dict, extended_day_list, 0, max_depth)
+                repaired = self.rec_repair(start_day_dict, moved, start_days, usage_changes, undo_log, 0, max_depth)
+                if profiler is not None and (repaired or max_depth >= PARAMETERS['max_depth']):
+                    profiler.repair_depths[max_depth] = profiler.repair_depths.get(max_depth, 0) + 1
 
-                if repair_result is None:
+                if not repaired:
                     if max_depth < PARAMETERS['max_depth']:
                         max_depth += PARAMETERS['max_depth_increase']
                         continue
@@ -665,38 +592,41 @@ class Candidate:
                 else:
                     #debug_print("WE FIXED YOUR PROBLEM FOR YOU MATE")
                     self.valid = True
-                    # to create a "normal" day-list from the extended day-list,
-                    # we only need to delete the "running" entries from the latter
-
-                    new_day_list = []
-                    for requests_per_day in repair_result:
-                        new_day_list.append({req_id: state for req_id, state in requests_per_day.items() if state != "running"})
-
-                    # make the result stick
-                    self.day_list = new_day_list
                     break
 
-    def rec_repair(self, move_dict, current_extended_daylist, depth, max_depth):
+        # make the result stick
+        self.start_days = start_days
+
+    def rec_repair(self, move_dict, moved, start_days, usage_changes, undo_log, depth, max_depth):
         """The recursive part of the repair.
 
-        This function keeps track of the recursion depth used and will return None, if the maximum depth has been
+        Every move changes the start day of a request in start_days and updates the usage_changes of its tool
+        in constant time, such that checking the peak only takes one pass over the days.
+        Moves which did not lead to a fix are reverted via the undo log, so every branch of the search starts
+        from the same state as its siblings, and no state has to be copied.
+        This function keeps track of the recursion depth used and will return False, if the maximum depth has been
         exceeded.
-        :param move_dict: The dictionary containing the not-yet-tried moves per request
-        :param current_extended_daylist: The extended day-list on which to base the movements
+        :param move_dict: The dictionary containing the possible start days per request
+        :param moved: The set of the IDs of the requests already moved on the current path of the search
+        :param start_days: The start days of the requests on which to base the movements (changed by the moves)
+        :param usage_changes: The difference array of the daily usages of the tool (changed by the moves)
+        :param undo_log: The list of the moves made on the current path of the search
         :param depth: The current depth of the iteration
         :param max_depth: The maximum depth of the iteration
-        :return: The extended day-list representing a fix, or None if no such day-list could be found
+        :return: True if the moves fixed the peak (start_days then holds the fix),
+                 False otherwise (start_days and usage_changes are then unchanged)
         """
+        if profiler is not None:
+            profiler.count('rec_repair_calls')
 
         chosen_request = None
         max_impact = 0
-        next_move_dict = move_dict.copy()
         tool_id = None
         tool_availability = None
 
         for req_id in move_dict:
-            # if the list of possible start days is not empty...
-            if move_dict[req_id]:
+            # if the list of possible start days is not empty and the request has not been moved yet...
+            if move_dict[req_id] and req_id not in moved:
                 tmp_request = problem_instance["requests"][req_id]
                 if tmp_request.num_tools > max_impact:
                     max_impact = tmp_request.num_tools
@@ -706,46 +636,568 @@ class Candidate:
 
         if chosen_request is None:
             # at this point, we have exhausted all possible moves
-            return None
+            return False
 
         # we don't want to move the same request twice in recursive calls
-        next_move_dict[chosen_request.id] = []
+        moved.add(chosen_request.id)
 
         # look at all the possible positions for the chosen request
         for position in move_dict[chosen_request.id]:
-            tmp_ext_daylist = current_extended_daylist.copy()
-            start_day = position
-            end_day = position + chosen_request.num_days
-
-            # update the extended day list:
-            # remove all old occurrences of the chosen request
-            # and set up the new ones
-            for (day_idx, req_dict) in enumerate(tmp_ext_daylist):
-                req_dict.pop(chosen_request.id, None)
-
-                if start_day == day_idx:
-                    tmp_ext_daylist[day_idx][chosen_request.id] = "deliver"
-                elif end_day == day_idx:
-                    tmp_ext_daylist[day_idx][chosen_request.id] = "fetch"
-                elif start_day < day_idx < end_day:
-                    tmp_ext_daylist[day_idx][chosen_request.id] = "running"
-
-            # get usages for our tool and the new daylist
-            tmp_usages = tool_usages_from_extended_daylist(tmp_ext_daylist)[tool_id]
-            new_peak = max(tmp_usages)
-
-            # if this move fixed the peak, let's return the extended day list that fixed the problem
+            apply_move(chosen_request, position, start_days, usage_changes, undo_log)
+
+            # get the peak of the usages for our tool
+            # (the sum over all changes is zero, so the extra entry at the end does not matter)
+            new_peak = max(itertools.accumulate(usage_changes))
+
+            # if this move fixed the peak, we are done
             if new_peak <= tool_availability:
-                return tmp_ext_daylist
+                return True
 
             # if we haven't repaired the problem at this stage, let's try to go deeper
             if depth < max_depth:
-                deeper_result = self.rec_repair(next_move_dict, tmp_ext_daylist, depth + 1, max_depth)
-                if deeper_result is not None:
-                    return deeper_result
+                if self.rec_repair(move_dict, moved, start_days, usage_changes, undo_log, depth + 1, max_depth):
+                    return True
+
+            revert_move(start_days, usage_changes, undo_log)
 
         # at this point, we have exhausted all possibilities and still not found a solution
-        return None
+        moved.discard(chosen_request.id)
+        return False
+
+
+class DayRouteCache:
+    """Cache of the routes of single days, shared by all candidates of the process.
+
+    The key of an entry is the requests of the day (pairs of request ID and 'deliver' or 'fetch')
+    together with the critical context of the day, the value is the result of route_day.
+    If the cache is full, the least recently used entry is evicted.
+    """
+    def __init__(self, max_size):
+        # ctor
+        self.max_size = max_size
+        self.entries = collections.OrderedDict()
+
+    def get(self, key):
+        """Look up the routes of a day.
+
+        :param key: The requests and the critical context of the day
+        :return: The cached result of route_day, or None
+        """
+        routes = self.entries.get(key)
+        if routes is None:
+            if profiler is not None:
+                profiler.count('day_route_cache_misses')
+            return None
+
+        if profiler is not None:
+            profiler.count('day_route_cache_hits')
+        self.entries.move_to_end(key)
+        return routes
+
+    def put(self, key, routes):
+        """Store the routes of a day, evicting the least recently used entry if needed.
+
+        :param key: The requests and the critical context of the day
+        :param routes: The result of route_day
+        :return: nothing
+        """
+        self.entries[key] = routes
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+def route_day(requests_on_day, critical_context):
+    """Build the routes of a single day and assign them to cars.
+
+    The result only depends on the requests of the day and on its critical context, so it can be shared
+    by all candidates (and days) with the same requests and critical context (see DayRouteCache).
+    :param requests_on_day: The entry of the day-list for this day
+    :param critical_context: The critical tools of the day (see Candidate.get_critical_context)
+    :return: A tuple (CARS, DISTANCE, TOOL_PEAKS) with the list of cars (each a list of trips), the driven distance
+             and the additionally needed tools per tool ID, or False if the day could not be planned
+    """
+    trips_today = []
+    if profiler is not None:
+        start = time.perf_counter()
+
+    # check if we can use NN heuristic
+    # we can only use NN if FOR ALL TOOLS on this day this holds: (usages_max[tool][day] <= num_tools)
+    # otherwise we must make sure to fetch the tools before delivering them to not exceed the limit
+
+    # 1. find critical tools for this day
+    critical_tools = [tool_id for (tool_id, _) in critical_context]
+    critical_usages = dict(critical_context)
+
+    # 2. loop over critical tools, make tsp for critical requests
+    for critical_tool_id in critical_tools:
+        # filter requests which contain a critical tool with this id
+        critical_requests_deliver = [req_id for req_id, req_status in requests_on_day.items()
+                                   if (problem_instance['requests'][req_id].tool_id == critical_tool_id) and
+                                   (req_status == 'deliver')]
+
+        critical_requests_fetch   = [req_id for req_id, req_status in requests_on_day.items()
+                                   if (problem_instance['requests'][req_id].tool_id == critical_tool_id) and
+                                   (req_status == 'fetch')]
+
+        # while len(critical_requests_deliver) + len(critical_requests_fetch) > 0:
+        # constraints:
+        # 1. sum distance per car < max distance
+        # 2. -sum(fetch) + sum(deliver) = additional tools
+        #  this means for diff_deliver_fetch > 0, we load tools when leaving the depot, and return WITHOUT tools
+        #  and for diff_deliver_fetch < 0, we do NOT load tools when leaving the depot, but return with tools
+
+        # we need to fetch first, then deliver
+
+        # pair the fetch requests with the deliver requests, such that as few tools as possible go to waste
+        critical_routes = create_critical_routes(critical_tool_id, critical_requests_deliver, critical_requests_fetch)
+        if critical_routes is None:
+            if profiler is not None:
+                profiler.add_time('route_critical', start)
+            return False
+
+        for route in critical_routes:
+            trip = Trip()
+            trip.generated_by = "sfad"
+            trip.convert_from_stopovers(route)
+            trips_today.append(trip)
+
+        # after we have allocated all requests on that day, let's sum up how many
+        # tools we "wasted" (i.e. brought to the depot without further using them)
+        unused_tools = 0
+        for trip in trips_today:
+            unused_tools += trip.current_load[critical_tool_id]
+
+        available = problem_instance["tools"][critical_tool_id].num_available
+        opt_max = critical_usages[critical_tool_id]
+        actual_usage = unused_tools + opt_max
+        if actual_usage > available:
+            #debug_print("THE WIGGLE ROOM WAS EXHAUSTED")
+            if profiler is not None:
+                profiler.count('wiggle_room_exhausted')
+                profiler.add_time('route_critical', start)
+            return False
+
+    if profiler is not None:
+        profiler.add_time('route_critical', start)
+        start = time.perf_counter()
+
+    # 3. loop over remaining (non critical) requests, use NN heuristic (or the savings algorithm)
+    # 3.1 get all critical requests
+    non_critical_requests = {req_id: req_status for (req_id, req_status) in requests_on_day.items()
+                                if problem_instance['requests'][req_id].tool_id not in critical_tools}
+
+    if PARAMETERS['route_construction'] == 'savings':
+        trips_today.extend(create_savings_trips(non_critical_requests))
+        if profiler is not None:
+            profiler.add_time('route_savings', start)
+            start = time.perf_counter()
+    elif PARAMETERS['route_construction'] == 'nearest_neighbour':
+        trips_today.extend(create_nearest_neighbour_trips(non_critical_requests))
+        if profiler is not None:
+            profiler.add_time('route_nearest_neighbour', start)
+            start = time.perf_counter()
+    else:
+        raise Exception('Unknown route construction: ' + str(PARAMETERS['route_construction']))
+
+    if PARAMETERS['route_improvement']:
+        trips_today = [improve_trip(trip) for trip in trips_today]
+        if profiler is not None:
+            profiler.add_time('route_improvement', start)
+            start = time.perf_counter()
+
+    # assign the trips to cars
+    cars = assign_trips_to_cars(trips_today)  # list of cars with list of trips inside
+
+    # 4. Now we have calculated all TSPs of this day
+    # sum up the distance and the tools we need to load at the depot (on top of those at a customer's place)
+    distance_day = 0
+    max_tools_used_on_day = {tool_id: 0 for (tool_id, _) in problem_instance['tools'].items()}
+    for car in cars:
+        max_additional_tools_car = {tool_id: 0 for (tool_id, _) in problem_instance['tools'].items()}
+        currently_used_tools_car = {tool_id: 0 for (tool_id, _) in problem_instance['tools'].items()}
+        for trip in car:
+            for (tool_id, _) in problem_instance['tools'].items():
+                # add all the stuff we load at the depot (first stop of the trip)
+                currently_used_tools_car[tool_id] += trip.depot_load[tool_id]
+                if currently_used_tools_car[tool_id] > max_additional_tools_car[tool_id]:
+                    max_additional_tools_car[tool_id] = currently_used_tools_car[tool_id]
+                # subtract what we bring back to the depot (last stop of the trip)
+                currently_used_tools_car[tool_id] -= trip.current_load[tool_id]
+
+            distance_day += trip.distance
+
+        for (tool_id, _) in problem_instance['tools'].items():
+            max_tools_used_on_day[tool_id] += max_additional_tools_car[tool_id]
+
+    if profiler is not None:
+        profiler.add_time('assign_cars', start)
+    return cars, distance_day, max_tools_used_on_day
+
+
+def create_nearest_neighbour_trips(non_critical_requests):
+    """Build the trips of the non-critical requests of a day by the nearest neighbour heuristic.
+
+    Each trip goes on to the nearest pending request, until that request does not fit into the trip anymore.
+    :param non_critical_requests: A dictionary {REQUEST_ID: 'deliver' or 'fetch'} of the requests
+    :return: The list of trips
+    """
+    trips = []
+    current_trip = Trip()
+    pending_requests = PendingRequests((req_id, problem_instance['requests'][req_id].customer_id)
+                                       for req_id in non_critical_requests)
+    # just loop while we still have requests to to
+    while pending_requests:
+        # find the nearest neighbour of the last point in the trip (and remove it from the requests yet to assign)
+        last_stopover_customer_id = current_trip.stopovers[-1].customer_id
+        nn_req_id = pending_requests.pop_nearest(last_stopover_customer_id)
+
+        # create a new stopover for the nearest neighbour (a stopover needs customer_id, request_id, num_tools)
+        nn_req_status = non_critical_requests[nn_req_id]
+        nn_customer_id = problem_instance['requests'][nn_req_id].customer_id
+        nn_num_tools = problem_instance['requests'][nn_req_id].num_tools
+        if nn_req_status == 'fetch':
+            nn_num_tools *= -1
+        nn_stopover = StopOver(nn_customer_id, nn_req_id, nn_num_tools)
+
+        if not current_trip.try_add(nn_stopover):  # trip is full
+            current_trip.finalize()
+            trips.append(current_trip)  # finalize the trip
+            current_trip = Trip()  # reset the current_trip
+            current_trip.try_add(nn_stopover)  # the first stop can never fail, unless our problem instance is faulty
+
+    current_trip.finalize()
+    trips.append(current_trip)  # add the last trip to the array
+    return trips
+
+
+class SavingsRoute:
+    def __init__(self, stopover):
+        # ctor
+        # a route of the savings algorithm, starting with a single stopover
+        # depot_load: tools loaded at the depot, end_load: tools on board at the end (per tool id, only if non-zero)
+        # max_size: the summed up sizes of the tools on board, maximum over all stopovers
+        tool_id = problem_instance['requests'][stopover.request_id].tool_id
+        self.stopovers = [stopover]
+        self.depot_load = {tool_id: stopover.num_tools} if stopover.num_tools > 0 else {}
+        self.end_load = {tool_id: -stopover.num_tools} if stopover.num_tools < 0 else {}
+        self.max_size = abs(stopover.num_tools) * tool_sizes[tool_id]
+        self.distance = 2 * distance_rows[0][stopover.customer_id]
+
+    def try_append(self, other, saving):
+        """Append the other route to this one, if the merged route fits into a car.
+
+        The tools at the end of this route can be delivered by the other route; of the tools which the other route
+        needs, only the missing ones (extra_k = max(0, depot_load_k - end_load_k) of tool k) are additionally
+        loaded at the depot and on board during this route. The tools which are not delivered stay on board
+        during the other route. This is the same load profile as Trip.try_add creates for the merged route.
+        :param other: The route to append (it must not be used anymore if this succeeds)
+        :param saving: The distance saved by driving from the end of this route to the start of the other one
+        :return: True if the routes got merged, False otherwise
+        """
+        distance = self.distance + other.distance - saving
+        if distance > problem_instance['max_trip_distance']:
+            return False
+
+        extra_loads = {}
+        extra_size = 0
+        for (tool_id, amount) in other.depot_load.items():
+            extra = amount - self.end_load.get(tool_id, 0)
+            if extra > 0:
+                extra_loads[tool_id] = extra
+                extra_size += extra * tool_sizes[tool_id]
+        left_loads = {}
+        left_size = 0
+        for (tool_id, amount) in self.end_load.items():
+            left = amount - other.depot_load.get(tool_id, 0)
+            if left > 0:
+                left_loads[tool_id] = left
+                left_size += left * tool_sizes[tool_id]
+
+        max_size = max(self.max_size + extra_size, other.max_size + left_size)
+        if max_size > problem_instance['capacity']:
+            return False
+
+        for (tool_id, extra) in extra_loads.items():
+            self.depot_load[tool_id] = self.depot_load.get(tool_id, 0) + extra
+        end_load = dict(other.end_load)
+        for (tool_id, left) in left_loads.items():
+            end_load[tool_id] = end_load.get(tool_id, 0) + left
+        self.end_load = end_load
+        self.max_size = max_size
+        self.distance = distance
+        self.stopovers.extend(other.stopovers)
+        return True
+
+
+def create_savings_trips(non_critical_requests):
+    """Build the trips of the non-critical requests of a day by the savings algorithm of Clarke and Wright.
+
+    Every request starts in its own trip. For each pair of requests, driving from one to the other
+    instead of via the depot saves distance[a][0] + distance[0][b] - distance[a][b]. Going through the pairs
+    by decreasing savings, the trip ending at the one request is joined with the trip starting at the other one,
+    if the merged trip fits into a car (see SavingsRoute.try_append).
+    :param non_critical_requests: A dictionary {REQUEST_ID: 'deliver' or 'fetch'} of the requests
+    :return: The list of trips
+    """
+    distance = distance_rows
+    stopovers = []
+    for (req_id, req_status) in non_critical_requests.items():
+        request = problem_instance['requests'][req_id]
+        num_tools = -request.num_tools if req_status == 'fetch' else request.num_tools
+        stopovers.append(StopOver(request.customer_id, req_id, num_tools))
+
+    # the savings list of the day, for every pair of stopover indices A < B,
+    # packed into one integer (SAVING << 32 | A << 16 | B) per pair, as integers are much faster to sort than tuples
+    savings = []
+    from_depot = distance[0]
+    customers = [stopover.customer_id for stopover in stopovers]
+    for (idx_a, customer_a) in enumerate(customers):
+        distances_a = distance[customer_a]
+        base = (from_depot[customer_a] << 32) | (idx_a << 16)
+        savings.extend(base + ((from_depot[customer_b] - distances_a[customer_b]) << 32) + idx_b
+                       for (idx_b, customer_b) in enumerate(customers[idx_a + 1:], idx_a + 1))
+    savings.sort(reverse=True)
+
+    routes = [SavingsRoute(stopover) for stopover in stopovers]
+    members = [[idx] for idx in range(len(stopovers))]  # the stopover indices of each route, in order
+    route_of = list(range(len(stopovers)))  # index of the route which contains each stopover
+    # whether each stopover is the first or the last one of its route (only those can be joined)
+    is_first = bytearray(b'\x01') * len(stopovers)
+    is_last = bytearray(b'\x01') * len(stopovers)
+    max_distance = problem_instance['max_trip_distance']
+    for packed_saving in savings:
+        saving = packed_saving >> 32
+        if saving <= 0:
+            break
+
+        # the distances are symmetric, so the saving is the same in both directions
+        (idx_a, idx_b) = ((packed_saving >> 16) & 0xFFFF, packed_saving & 0xFFFF)
+        if is_last[idx_a] and is_first[idx_b]:
+            (first_idx, second_idx) = (idx_a, idx_b)
+        elif is_last[idx_b] and is_first[idx_a]:
+            (first_idx, second_idx) = (idx_b, idx_a)
+        else:
+            continue
+
+        (first_route_idx, second_route_idx) = (route_of[first_idx], route_of[second_idx])
+        if first_route_idx == second_route_idx:
+            continue
+        (first_route, second_route) = (routes[first_route_idx], routes[second_route_idx])
+        if first_route.distance + second_route.distance - saving > max_distance:
+            continue
+
+        if first_route.try_append(second_route, saving):
+            for idx in members[second_route_idx]:
+                route_of[idx] = first_route_idx
+            members[first_route_idx].extend(members[second_route_idx])
+            routes[second_route_idx] = None
+            is_last[first_idx] = 0
+            is_first[second_idx] = 0
+
+    trips = []
+    for route in routes:
+        if route is not None:
+            trip = Trip()
+            trip.generated_by = "savings"
+            trip.convert_from_stopovers([StopOver(0, 0, 0)] + route.stopovers + [StopOver(0, 0, 0)])
+            trips.append(trip)
+    return trips
+
+
+def assign_trips_to_cars(trips):
+    """Assign the trips of a day to cars, such that no car drives more than the maximum distance.
+
+    This is a bin-packing problem (the cars are the bins, the distances of the trips are the sizes), which is
+    solved according to the parameter 'car_assignment':
+    'next_fit' fills one car after another in the order of the trips,
+    'first_fit_decreasing' puts the longest trips first, each into the first car where it fits, and
+    'best_fit_decreasing' puts the longest trips first, each into the car where it leaves the least distance unused.
+    If the parameter 'car_assignment_improvement' is set, the least used cars are emptied afterwards,
+    as long as all of their trips fit into the other cars.
+    The trips of each car keep their original order. Trips without any stops are dropped.
+    :param trips: The list of trips of the day
+    :return: The list of cars, each a list of trips
+    """
+    if PARAMETERS['car_assignment'] not in ('next_fit', 'first_fit_decreasing', 'best_fit_decreasing'):
+        raise Exception('Unknown car assignment: ' + str(PARAMETERS['car_assignment']))
+
+    max_distance = problem_instance['max_trip_distance']
+    trips = [trip for trip in trips if len(trip.stopovers) > 1]
+    if PARAMETERS['car_assignment'] == 'next_fit':
+        cars = []
+        sum_distance_car = max_distance + 1  # the first trip opens a car
+        for trip in trips:
+            if (sum_distance_car + trip.distance) > max_distance:
+                cars.append([])
+                sum_distance_car = 0
+
+            cars[-1].append(trip)  # append trip to car
+            sum_distance_car += trip.distance
+        return cars
+
+    # the trip indices per car, and the remaining distance of each car
+    trips_of_car = []
+    remaining = []
+    for trip_idx in sorted(range(len(trips)), key=lambda idx: trips[idx].distance, reverse=True):
+        car_idx = find_car(remaining, trips[trip_idx].distance)
+        if car_idx is None:
+            trips_of_car.append([])
+            remaining.append(max_distance)
+            car_idx = len(remaining) - 1
+
+        trips_of_car[car_idx].append(trip_idx)
+        remaining[car_idx] -= trips[trip_idx].distance
+
+    if PARAMETERS['car_assignment_improvement']:
+        while len(trips_of_car) > 1:
+            # try to empty the car with the most remaining distance
+            emptied_car_idx = max(range(len(remaining)), key=lambda idx: remaining[idx])
+            new_trips_of_car = [list(trip_indices) for trip_indices in trips_of_car]
+            new_remaining = list(remaining)
+            new_remaining[emptied_car_idx] = -1  # no trips can be moved there
+            for trip_idx in sorted(trips_of_car[emptied_car_idx], key=lambda idx: trips[idx].distance, reverse=True):
+                car_idx = find_car(new_remaining, trips[trip_idx].distance)
+                if car_idx is None:
+                    break
+                new_trips_of_car[car_idx].append(trip_idx)
+                new_remaining[car_idx] -= trips[trip_idx].distance
+            else:
+                del new_trips_of_car[emptied_car_idx]
+                del new_remaining[emptied_car_idx]
+                (trips_of_car, remaining) = (new_trips_of_car, new_remaining)
+                continue
+            break
+
+    return [[trips[trip_idx] for trip_idx in sorted(trip_indices)] for trip_indices in trips_of_car]
+
+
+def find_car(remaining, distance):
+    """Find the car for a trip (according to the parameter 'car_assignment', see assign_trips_to_cars).
+
+    :param remaining: The list of the remaining distances of the cars
+    :param distance: The distance of the trip
+    :return: The index of the car, or None if the trip does not fit into any car
+    """
+    best_car_idx = None
+    for (car_idx, remaining_distance) in enumerate(remaining):
+        if remaining_distance >= distance:
+            if PARAMETERS['car_assignment'] == 'first_fit_decreasing':
+                return car_idx
+            if best_car_idx is None or remaining_distance < remaining[best_car_idx]:
+                best_car_idx = car_idx
+    return best_car_idx
+
+
+def improve_trip(trip):
+    """Shorten a finished trip by 2-opt and Or-opt moves, until none of them shortens it any further.
+
+    A 2-opt move reverses a part of the trip, an Or-opt move moves up to three consecutive stops (possibly reversed)
+    to another place in the trip. Only moves which create an edge between a stop and one of its nearest customers
+    are tried, and the change of the distance of a move is calculated from the changed edges only.
+    A shorter trip is only accepted if it fits into the car (see Trip.try_add) and does not need more tools
+    from the depot, such that the tools used on the day do not change (or decrease).
+    :param trip: The finished trip (see Trip.finalize)
+    :return: The improved trip (a new one), or the given trip if it could not be improved
+    """
+    distance = distance_rows
+    stopovers = trip.stopovers
+    improved = len(stopovers) > 4  # the distances are symmetric, so every order of two stops is equally long
+    while improved:
+        improved = False
+        positions = {}
+        for (idx, stopover) in enumerate(stopovers):
+            positions.setdefault(stopover.customer_id, []).append(idx)
+
+        for new_stopovers in trip_moves(stopovers, positions, distance):
+            new_trip = trip_from_stopovers(new_stopovers, trip)
+            if new_trip is not None:
+                (trip, stopovers) = (new_trip, new_trip.stopovers)
+                improved = True
+                break
+
+    return trip
+
+
+def trip_moves(stopovers, positions, distance):
+    """Generate the 2-opt and Or-opt moves of a trip which shorten it (see improve_trip).
+
+    :param stopovers: The stopovers of the trip, starting and ending at the depot
+    :param positions: A dictionary {CUSTOMER_ID: LIST_OF_INDICES} of the stopovers of each customer
+    :param distance: The distance matrix
+    :return: A generator of the stopovers after each move
+    """
+    last_idx = len(stopovers) - 1
+    customers = [stopover.customer_id for stopover in stopovers]
+
+    # 2-opt: replace the edges (p, p + 1) and (q, q + 1) by (p, q) and (p + 1, q + 1), i.e. reverse p + 1 .. q
+    for (idx, customer_id) in enumerate(customers[:-1]):
+        for neighbour_id in nearest_customers[customer_id]:
+            for neighbour_idx in positions.get(neighbour_id, ()):
+                (p, q) = (idx, neighbour_idx) if idx < neighbour_idx else (neighbour_idx, idx)
+                if q - p < 2 or q == last_idx:
+                    continue
+                delta = (distance[customers[p]][customers[q]] + distance[customers[p + 1]][customers[q + 1]]
+                         - distance[customers[p]][customers[p + 1]] - distance[customers[q]][customers[q + 1]])
+                if delta < 0:
+                    yield stopovers[:p + 1] + stopovers[q:p:-1] + stopovers[q + 1:]
+
+    # Or-opt: move the stops first .. last behind the stop at target (reversed, if it gets attached by its last stop)
+    for length in (1, 2, 3):
+        for first in range(1, last_idx - length + 1):
+            last = first + length - 1
+            (before, after) = (customers[first - 1], customers[last + 1])
+            removal_delta = (distance[before][after] - distance[before][customers[first]]
+                             - distance[customers[last]][after])
+            for (attached, other) in ((first, last), (last, first)) if length > 1 else ((first, last),):
+                for neighbour_id in nearest_customers[customers[attached]]:
+                    for target in positions.get(neighbour_id, ()):
+                        if first - 1 <= target <= last or target == last_idx:
+                            continue
+                        delta = (removal_delta - distance[customers[target]][customers[target + 1]]
+                                 + distance[customers[target]][customers[attached]]
+                                 + distance[customers[other]][customers[target + 1]])
+                        if delta >= 0:
+                            continue
+                        segment = stopovers[first:last + 1] if attached == first else stopovers[last:first - 1:-1]
+                        rest = stopovers[:first] + stopovers[last + 1:]
+                        insert_idx = target + 1 if target < first else target + 1 - length
+                        yield rest[:insert_idx] + segment + rest[insert_idx:]
+
+
+def trip_from_stopovers(stopovers, old_trip):
+    """Create the trip with the stopovers in the given order, if it is as valid as the old one (see improve_trip).
+
+    :param stopovers: The stopovers of the new trip, starting and ending at the depot
+    :param old_trip: The trip with the same stopovers in the old order
+    :return: The new trip, or None if it exceeds the capacity or the distance, or needs more tools from the depot
+    """
+    new_trip = Trip()
+    new_trip.generated_by = old_trip.generated_by
+    for stopover in stopovers[1:-1]:
+        if not new_trip.try_add(stopover):
+            return None
+    new_trip.finalize()
+
+    for (tool_id, amount) in enumerate(new_trip.depot_load):
+        if amount > old_trip.depot_load[tool_id]:
+            return None
+    return new_trip
+
+
+def find_nearest_customers(problem, number):
+    """Find the nearest other customers (incl. the depot) of each customer.
+
+    :param problem: The problem instance
+    :param number: The number of nearest customers per customer
+    :return: A list of tuples with the IDs of the nearest customers, indexed by customer ID
+    """
+    num_customers = len(problem['distance'].rows)
+    nearest = []
+    for customer_id in range(num_customers):
+        distances = problem['distance'].rows[customer_id]
+        nearest_ids = heapq.nsmallest(number + 1, range(num_customers), key=distances.__getitem__)
+        nearest.append(tuple(other_id for other_id in nearest_ids if other_id != customer_id)[:number])
+    return nearest
 
 
 def translate(value, left_min, left_max, right_min, right_max):
@@ -800,7 +1252,7 @@ def is_route_valid(route, tool_id):
             continue
 
         last_customer_id = route[idx-1].customer_id
-        sum_distance += problem_instance['distance'][last_customer_id][customer_id]
+        sum_distance += distance_rows[last_customer_id][customer_id]
 
         # change amount is subtracted because we use negative numbers to
         # indicate FETCH requests (which is where tools get loaded)
@@ -831,228 +1283,1095 @@ def is_route_valid(route, tool_id):
     return True
 
 
-def tool_usages_from_extended_daylist(ext_day_list):
-    """Calculate the tool usages from the given extended day list.
-
-    The result will be a dictionary with Tool IDs as keys and a list as value.
-    The value list has one entry per day of the problem and the entry's value equals to the amount of tools
-    required at this day as per optimistic maximum
-    (i.e. tools still at a customer's place + tools requested - tools returned)
-    :param ext_day_list: The extended day-list to calculate the daily uses from
-    :return: The usage dictionary in form of {TOOL_ID: [LIST_OF_USES_PER_DAY]}
+def create_critical_routes(tool_id, deliver_request_ids, fetch_request_ids):
+    """Build the routes of the requests of a critical tool on a day, fetching tools before delivering them.
+
+    Every tool which is fetched and brought back to the depot (instead of being delivered on the same route)
+    counts towards the tools in use on the day, so the deliveries and the fetches are paired up by a min-cost
+    assignment: a pair goes on one route (depot, fetch, deliver, depot), and costs primarily the negative number
+    of tools which it passes on from the fetch to the delivery, and secondarily the distance it adds compared to
+    two separate routes. Deliveries which still need more tools afterwards take the closest of the remaining
+    fetches (before their delivery), as long as the route stays valid.
+    The remaining deliveries and fetches get routes of their own.
+    :param tool_id: The ID of the critical tool
+    :param deliver_request_ids: The IDs of the deliver requests of the tool on the day
+    :param fetch_request_ids: The IDs of the fetch requests of the tool on the day
+    :return: A list of routes (lists of StopOvers, checked by is_route_valid), or None if a request cannot be routed
     """
-    usage = {}
-    for tool_id in problem_instance["tools"]:
-        usage[tool_id] = [0 for day in ext_day_list]
+    distance = distance_rows
+    requests = problem_instance['requests']
+    deliveries = [StopOver(requests[req_id].customer_id, req_id, requests[req_id].num_tools)
+                  for req_id in deliver_request_ids]
+    fetches = [StopOver(requests[req_id].customer_id, req_id, -requests[req_id].num_tools)
+               for req_id in fetch_request_ids]
+
+    # a tool passed on outweighs any distance (no pair saves or adds more than the maximum trip distance)
+    max_distance = problem_instance['max_trip_distance']
+    tool_weight = 2 * max_distance * (len(deliveries) + 1)
+    max_num_tools = problem_instance['capacity'] // tool_sizes[tool_id]
+    from_depot = distance[0]
+    # one row per delivery and one column per fetch, every valid pair costs less than zero (the cost of no pair)
+    costs = []
+    for deliver in deliveries:
+        row = [0] * len(fetches)
+        distances_to_deliver = distance[deliver.customer_id]
+        for (fetch_idx, fetch) in enumerate(fetches):
+            # the same checks as in is_route_valid: the most tools on board are the fetched or the delivered ones
+            pair_distance = (from_depot[fetch.customer_id] + distances_to_deliver[fetch.customer_id]
+                             + from_depot[deliver.customer_id])
+            if pair_distance <= max_distance and max(-fetch.num_tools, deliver.num_tools) <= max_num_tools:
+                passed_on = min(-fetch.num_tools, deliver.num_tools)
+                added_distance = pair_distance - 2 * (from_depot[fetch.customer_id] + from_depot[deliver.customer_id])
+                row[fetch_idx] = added_distance - tool_weight * passed_on
+        costs.append(row)
+
+    # the assignment is fastest with the smaller side as rows
+    if len(deliveries) <= len(fetches):
+        pairs = enumerate(min_cost_assignment(costs))
+    else:
+        transposed_costs = [list(column) for column in zip(*costs)]
+        pairs = ((deliver_idx, fetch_idx)
+                 for (fetch_idx, deliver_idx) in enumerate(min_cost_assignment(transposed_costs)))
+
+    fetches_of_delivery = [[] for _ in deliveries]
+    remaining_fetches = set(range(len(fetches)))
+    for (deliver_idx, fetch_idx) in pairs:
+        if costs[deliver_idx][fetch_idx] < 0:
+            fetches_of_delivery[deliver_idx].append(fetch_idx)
+            remaining_fetches.discard(fetch_idx)
+
+    routes = []
+    # the deliveries with the most tools first
+    for deliver_idx in sorted(range(len(deliveries)), key=lambda idx: deliveries[idx].num_tools, reverse=True):
+        deliver = deliveries[deliver_idx]
+        route = ([StopOver(0, 0, 0)] + [fetches[fetch_idx] for fetch_idx in fetches_of_delivery[deliver_idx]]
+                 + [deliver, StopOver(0, 0, 0)])
+        if not is_route_valid(route, tool_id):
+            return None
+
+        # add further fetches while the delivery needs tools from the depot (see is_route_valid)
+        distances_to_deliver = distance[deliver.customer_id]
+        for fetch_idx in sorted(remaining_fetches, key=lambda idx: distances_to_deliver[fetches[idx].customer_id]):
+            if route[0].num_tools >= 0:
+                break
+            new_route = [StopOver(0, 0, 0)] + route[1:-2] + [fetches[fetch_idx], deliver, StopOver(0, 0, 0)]
+            if is_route_valid(new_route, tool_id):
+                route = new_route
+                remaining_fetches.discard(fetch_idx)
+        routes.append(route)
+
+    for fetch_idx in sorted(remaining_fetches):
+        route = [StopOver(0, 0, 0), fetches[fetch_idx], StopOver(0, 0, 0)]
+        if not is_route_valid(route, tool_id):
+            debug_print("For some reason, could not fulfill the single fetch")
+            return None
+        routes.append(route)
+
+    return routes
+
 
-    for (day_idx, req_dict) in enumerate(ext_day_list):
-        for (req_id, req_state) in req_dict.items():
-            request = problem_instance["requests"][req_id]
-            tool_id = request.tool_id
-            delivery_amount = 0
-            running_amount = 0
-            fetch_amount = 0
+def min_cost_assignment(costs):
+    """Assign a different column to each row of the cost matrix, such that the summed up costs are minimal.
+
+    This is the Hungarian method (with potentials, in O(rows^2 * columns)).
+    :param costs: A list of rows, each a list of the costs of its columns, with at least as many columns as rows
+    :return: A list with the column assigned to each row
+    """
+    num_rows = len(costs)
+    if num_rows == 0:
+        return []
+    num_cols = len(costs[0])
+
+    # the potentials of the rows and columns and the row assigned to each column (1-based, 0 = none)
+    row_potentials = [0] * (num_rows + 1)
+    col_potentials = [0] * (num_cols + 1)
+    row_of_col = [0] * (num_cols + 1)
+    previous_col = [0] * (num_cols + 1)
+    for row in range(1, num_rows + 1):
+        # find a shortest augmenting path from the new row to a free column
+        row_of_col[0] = row
+        col = 0
+        min_slack = [math.inf] * (num_cols + 1)
+        used = [False] * (num_cols + 1)
+        while row_of_col[col] != 0:
+            used[col] = True
+            current_row = row_of_col[col]
+            row_costs = costs[current_row - 1]
+            row_potential = row_potentials[current_row]
+            delta = math.inf
+            next_col = 0
+            for other_col in range(1, num_cols + 1):
+                if not used[other_col]:
+                    slack = row_costs[other_col - 1] - row_potential - col_potentials[other_col]
+                    if slack < min_slack[other_col]:
+                        min_slack[other_col] = slack
+                        previous_col[other_col] = col
+                    if min_slack[other_col] < delta:
+                        delta = min_slack[other_col]
+                        next_col = other_col
+            for other_col in range(num_cols + 1):
+                if used[other_col]:
+                    row_potentials[row_of_col[other_col]] += delta
+                    col_potentials[other_col] -= delta
+                else:
+                    min_slack[other_col] -= delta
+            col = next_col
+
+        # flip the assignments along the path
+        while col != 0:
+            previous = previous_col[col]
+            row_of_col[col] = row_of_col[previous]
+            col = previous
+
+    assignment = [None] * num_rows
+    for col in range(1, num_cols + 1):
+        if row_of_col[col] != 0:
+            assignment[row_of_col[col] - 1] = col - 1
+    return assignment
+
+
+def tool_usages_from_start_days(start_days):
+    """Calculate the optimistic and the pessimistic maximum of the tools used per day.
+
+    The optimistic maximum of a day counts the tools at a customer's place (i.e. delivered, but not yet fetched),
+    assuming that the tools fetched on a day can directly be delivered to another customer.
+    The pessimistic maximum adds the tools fetched on the day, because they might only be available on the next day.
+    Both are computed with prefix sums over the start and end days of the requests.
+    :param start_days: An array with the start day of each request, indexed by request id
+    :return: A tuple (USAGES_MIN, USAGES_MAX), each a list indexed by tool id with a list of the usages per day
+    """
+    num_days = problem_instance['days']
+    changes = [[0] * (num_days + 1) for _ in tool_sizes]
+    deliveries = [[0] * num_days for _ in tool_sizes]
+    for (request_id, request) in problem_instance['requests'].items():
+        start_day = start_days[request_id]
+        changes[request.tool_id][start_day] += request.num_tools
+        changes[request.tool_id][start_day + request.num_days] -= request.num_tools
+        deliveries[request.tool_id][start_day] += request.num_tools
+
+    usages_min = []
+    usages_max = []
+    for (changes_of_tool, deliveries_of_tool) in zip(changes, deliveries):
+        usage_min = list(itertools.accumulate(changes_of_tool[:num_days]))
+        usages_min.append(usage_min)
+        # the tools at a customer's place from the previous day plus the tools delivered on this day
+        usages_max.append([0] * num_days)
+        usages_max[-1][0] = deliveries_of_tool[0]
+        for day_idx in range(1, num_days):
+            usages_max[-1][day_idx] = usage_min[day_idx - 1] + deliveries_of_tool[day_idx]
+
+    return usages_min, usages_max
+
+
+def add_usage_changes(usage_changes, request, start_day, sign):
+    """Add (or remove) the usages of a request to the difference array of the usages of its tool.
+
+    Like in the repair, the tools of a request count as used from its start day until the day before its end day,
+    and negatively on the day they are fetched.
+    :param usage_changes: The difference array of the usages (one entry per day, and one more)
+    :param request: The request
+    :param start_day: The start day of the request
+    :param sign: 1 to add the request, -1 to remove it
+    :return: nothing
+    """
+    amount = sign * request.num_tools
+    end_day = start_day + request.num_days
+    usage_changes[start_day] += amount
+    usage_changes[end_day] -= 2 * amount
+    usage_changes[end_day + 1] += amount
+
+
+def apply_move(request, start_day, start_days, usage_changes, undo_log):
+    """Move a request to another start day, and record the move in the undo log.
+
+    :param request: The request to move
+    :param start_day: The new start day of the request
+    :param start_days: The start days of the requests (changed)
+    :param usage_changes: The difference array of the usages of the request's tool (changed)
+    :param undo_log: The list of the moves made so far (the move gets appended)
+    :return: nothing
+    """
+    undo_log.append((request, start_days[request.id]))
+    add_usage_changes(usage_changes, request, start_days[request.id], -1)
+    start_days[request.id] = start_day
+    add_usage_changes(usage_changes, request, start_day, 1)
 
-            if req_state == "deliver":
-                delivery_amount = request.num_tools
-            elif req_state == "running":
-                running_amount = request.num_tools
-            elif req_state == "fetch":
-                fetch_amount = request.num_tools
 
-            change_amount = (delivery_amount + running_amount) - fetch_amount
-            usage[tool_id][day_idx] += change_amount
+def revert_move(start_days, usage_changes, undo_log):
+    """Revert the last move recorded in the undo log.
 
-    return usage
+    :param start_days: The start days of the requests (changed)
+    :param usage_changes: The difference array of the usages of the moved request's tool (changed)
+    :param undo_log: The list of the moves made so far (the last move gets removed)
+    :return: nothing
+    """
+    (request, start_day) = undo_log.pop()
+    add_usage_changes(usage_changes, request, start_days[request.id], -1)
+    start_days[request.id] = start_day
+    add_usage_changes(usage_changes, request, start_day, 1)
 
 
-def initial_population(population_size):
+def initial_population(population_size, pool=None, deadline=None):
     """Create the initial population for the genetic algorithm
 
-    :return: a list of candidates
+    :param population_size: The number of valid candidates to create
+    :param pool: An optional process pool, which is used to create and evaluate the candidates in parallel
+    :param deadline: An optional point in time, after which no more candidates are created
+    :return: a list of candidates (at least one)
+    :raises NoValidCandidateError: If the deadline passes before there is a single valid candidate
     """
 
-    # for each request, pick a random starting day and the corresponding end day
+    # optionally, start with candidates whose schedules need as few tools as possible
     population = []
-    i = 0
-    while i < population_size:
-        day_list = [{} for _ in range(problem_instance['days'])]
-
-        for key, request in problem_instance['requests'].items():
-            start_day = random.randrange(request.first_day,
-                                         request.last_day + 1)  # randrange excludes the stop point of the range.
-            day_list[start_day][request.id] = 'deliver'
-            day_list[start_day + request.num_days][request.id] = 'fetch'
-
-        candidate = Candidate(day_list)
-        candidate.repair()
-        if not candidate.valid:  # we need to create an additional candidate
-            continue
+    if PARAMETERS['exact_seeds'] > 0:
+        population = create_exact_candidates(min(PARAMETERS['exact_seeds'], population_size), pool)
+
+    # for each request, pick a starting day (and thus the end day)
+    if PARAMETERS['initial_construction'] == 'random':
+        create_candidate = create_random_candidate
+    elif PARAMETERS['initial_construction'] == 'greedy':
+        create_candidate = create_greedy_candidate
+    else:
+        raise Exception('Unknown initial construction: ' + str(PARAMETERS['initial_construction']))
+
+    batch_size = BATCH_SIZE_PER_PROCESS * PARAMETERS['num_processes']
+    # if not a single one of this many random candidates is valid, the greedy construction is used instead
+    # (the batches end exactly there, such that the switch does not depend on whether we run in parallel)
+    max_random_attempts = population_size
+    attempts = 0
+    while len(population) < population_size:
+        if is_deadline_passed(deadline):
+            if not population:
+                raise NoValidCandidateError("Time budget exhausted before a valid candidate was found")
+            debug_print("Time budget exhausted while creating the initial population")
+            break
+
+        if create_candidate is create_random_candidate and not population and attempts >= max_random_attempts:
+            debug_print("None of {} random candidates is valid, continuing with the greedy construction"
+                        .format(attempts))
+            create_candidate = create_greedy_candidate
+
+        # the seeds are drawn up front, such that the result does not depend on whether we run in parallel
+        num_seeds = min(batch_size, population_size - len(population))
+        if attempts < max_random_attempts:
+            num_seeds = min(num_seeds, max_random_attempts - attempts)
+        seeds = [random.getrandbits(32) for _ in range(num_seeds)]
+        attempts += len(seeds)
+        STATISTICS['evaluations'] += len(seeds)
+        for candidate in evaluate_tasks(create_candidate, seeds, pool):
+            if not candidate.valid:  # we need to create an additional candidate
+                STATISTICS['rejected_initial'] += 1
+                if profiler is not None:
+                    profiler.count('invalid_initial')
+                continue
 
-        fit_ = candidate.fitness_heuristic()
-        if fit_ == -1:
-            continue # candidate is not valid
+            population.append(candidate)
+            #debug_print("Found the {}. candidate!".format(len(population)))
 
-        candidate.fit = fit_
-        population.append(candidate)
-        i += 1
-        #debug_print("Found the {}. candidate!".format(i))
+    debug_print("Created the initial population of {} candidates ({} rejected)"
+                .format(len(population), STATISTICS['rejected_initial']))
     return population
 
 
-def combine(a, b):
+def create_exact_candidates(number, pool=None):
+    """Create candidates from schedules which respect the available tools and need as few tools as possible.
+
+    The schedules are found by an integer programming model (see schedule_solver), which requires OR-Tools.
+    If it is not installed, no candidates are created.
+    :param number: The number of candidates to create
+    :param pool: An optional process pool, which is used to evaluate the candidates in parallel
+    :return: a list of the valid candidates
+    """
+    if not schedule_solver.is_available():
+        debug_print("OR-Tools is not installed, the initial population is created randomly only")
+        return []
+
+    schedules = schedule_solver.create_schedules(problem_instance, number, PARAMETERS['exact_seeding_time_limit'],
+                                                 random.getrandbits(32))
+    STATISTICS['evaluations'] += len(schedules)
+    candidates = []
+    for candidate in evaluate_tasks(evaluate_candidate, schedules, pool):
+        if not candidate.valid:  # the routing can still fail
+            STATISTICS['rejected_initial'] += 1
+            if profiler is not None:
+                profiler.count('invalid_initial')
+            continue
+        candidates.append(candidate)
+
+    debug_print("Created {} of {} candidates from exact schedules".format(len(candidates), number))
+    return candidates
+
+
+def create_random_candidate(seed):
+    """Create a candidate with random start days, then repair and evaluate it.
+
+    :param seed: The seed for the random number generator used to pick the start days
+    :return: The new candidate (check its valid field)
+    """
+    rng = random.Random(seed)
+    start_days = array('h', [0]) * (len(problem_instance['requests']) + 1)
+
+    for key, request in problem_instance['requests'].items():
+        start_days[request.id] = rng.randrange(request.first_day,
+                                               request.last_day + 1)  # randrange excludes the stop point of the range.
+
+    candidate = Candidate(start_days)
+    if profiler is not None:
+        start = time.perf_counter()
+    candidate.repair()
+    if profiler is not None:
+        profiler.add_time('repair', start)
+    if not candidate.valid:
+        return candidate
+
+    if profiler is not None:
+        start = time.perf_counter()
+    fit_ = candidate.fitness_heuristic()
+    if profiler is not None:
+        profiler.add_time('fitness_heuristic', start)
+    if fit_ == -1:
+        return candidate  # candidate is not valid
+
+    candidate.fit = fit_
+    return candidate
+
+
+def create_greedy_candidate(seed):
+    """Create a candidate with greedily chosen start days, then repair and evaluate it.
+
+    The requests with the fewest possible start days (and then those needing the most tools) are scheduled first.
+    Each request gets the start day which keeps the peak of its tool's usage profile lowest
+    (the tools at a customer's place, like in the repair), preferring days on which the peak does not exceed
+    the available tools. Ties are broken randomly, such that the candidates differ.
+    :param seed: The seed for the random number generator used to order the requests and break ties
+    :return: The new candidate (check its valid field)
+    """
+    rng = random.Random(seed)
+    start_days = array('h', [0]) * (len(problem_instance['requests']) + 1)
+    usages = [[0] * problem_instance['days'] for _ in tool_sizes]
+
+    requests = sorted(problem_instance['requests'].values(),
+                      key=lambda request: (request.last_day - request.first_day,
+                                           -request.num_tools * request.num_days, rng.random()))
+    for request in requests:
+        usages_of_tool = usages[request.tool_id]
+        tool_availability = problem_instance['tools'][request.tool_id].num_available
+
+        best_start_days = []
+        best_score = None
+        for start_day in range(request.first_day, request.last_day + 1):
+            peak = max(usages_of_tool[start_day:start_day + request.num_days]) + request.num_tools
+            score = (max(0, peak - tool_availability), peak)
+            if best_score is None or score < best_score:
+                best_start_days = [start_day]
+                best_score = score
+            elif score == best_score:
+                best_start_days.append(start_day)
+
+        start_day = rng.choice(best_start_days)
+        start_days[request.id] = start_day
+        for day_idx in range(start_day, start_day + request.num_days):
+            usages_of_tool[day_idx] += request.num_tools
+
+    return evaluate_candidate(start_days)
+
+
+def combine(a, b, rng=random):
     """Let Candidates a and b create a child element, inheriting some characteristics of each
 
+    The child is neither repaired nor evaluated (see create_offspring).
     :param a:
     :param b:
+    :param rng: The random number generator to draw from (defaults to the random module)
     :return:
     """
 
-    new_day_list = [{} for _ in range(problem_instance['days'])]
-    for (request_id, request) in problem_instance['requests'].items():
-        r = random.random()
+    # for each request, one random decision from which candidate the child inherits the startday (and endday)
+    new_start_days = array('h', [0])
+    new_start_days.extend([start_day_a if rng.random() < 0.5 else start_day_b
+                           for (start_day_a, start_day_b) in zip(a.start_days[1:], b.start_days[1:])])
 
-        if r < 0.5:  # use the startday and endday from candidate a
-            chosen_candidate = a
-        else:  # use the startday and endday from candidate b
-            chosen_candidate = b
+    return Candidate(new_start_days)
 
-        for day_idx in range(request.first_day, request.last_day + 1):
-            if request_id in chosen_candidate.day_list[day_idx]:
-                new_day_list[day_idx]                   [request_id] = 'deliver'
-                new_day_list[day_idx + request.num_days][request_id] = 'fetch'
-                break
 
-    new_candidate = Candidate(new_day_list)
+def evaluate_candidate(start_days):
+    """Create a candidate from the start days of its requests, then repair and evaluate it.
+
+    :param start_days: An array with the start day of each request, indexed by request id
+    :return: The new candidate (check its valid field)
+    """
+    new_candidate = Candidate(start_days)
+    if profiler is not None:
+        start = time.perf_counter()
     new_candidate.repair()  # repair the candidate
-    fit_ = new_candidate.fitness_heuristic()
-    new_candidate.fit = fit_
+    if profiler is not None:
+        profiler.add_time('repair', start)
+    if new_candidate.valid:
+        if profiler is not None:
+            start = time.perf_counter()
+        fit_ = new_candidate.fitness_heuristic()
+        new_candidate.fit = fit_
+        if profiler is not None:
+            profiler.add_time('fitness_heuristic', start)
     return new_candidate
 
 
-def find_mating_pair(values, scale, blocked_values=None):
-    """From the values list, find a pair which is not in the blocked_list.
+def create_offspring(task):
+    """Create a child of two parents, repair and evaluate it, then mutate it (if it is valid).
 
-    :param values:
-    :param scale:
-    :param blocked_values:
-    :return: A tuple of Candidates
+    :param task: A triple of the form (START_DAYS_A, START_DAYS_B, SEED), where the seed is used
+                 for the random number generator of the crossover and the mutation
+    :return: The new candidate (check its valid field)
     """
+    (start_days_a, start_days_b, seed) = task
+    rng = random.Random(seed)
+
+    if profiler is not None:
+        start = time.perf_counter()
+    start_days = combine(Candidate(start_days_a), Candidate(start_days_b), rng).start_days
+    if profiler is not None:
+        profiler.add_time('combine', start)
+
+    new_candidate = evaluate_candidate(start_days)
+    if not new_candidate.valid:
+        if profiler is not None:
+            profiler.count('invalid_after_repair')
+        return new_candidate
+
+    # mutate (happens randomly)
+    if profiler is not None:
+        start = time.perf_counter()
+    new_candidate.mutate(rng)
+    if profiler is not None:
+        profiler.add_time('mutate', start)
+        if not new_candidate.valid:  # the mutation yielded an invalid candidate
+            profiler.count('invalid_after_mutation')
+    return new_candidate
 
-    if len(values) < 2:
-        raise Exception('Population too small')
 
-    if blocked_values is None:
-        blocked_values = []
+def day_list_from_start_days(start_days):
+    """Create a day-list from the start days of the requests.
 
-    val_0 = get_random_candidate(values, scale)
-    val_1 = None
+    :param start_days: An array with the start day of each request, indexed by request id
+    :return: The day-list (the requests of each day are ordered by their ID)
+    """
+    day_list = [{} for _ in range(problem_instance['days'])]
+    for (request_id, request) in problem_instance['requests'].items():
+        day_list[start_days[request_id]]                   [request_id] = 'deliver'
+        day_list[start_days[request_id] + request.num_days][request_id] = 'fetch'
 
-    while (val_1 is None) or (val_0 == val_1) \
-            or ((val_0, val_1) in blocked_values) or ((val_1, val_0) in blocked_values):
-        val_1 = get_random_candidate(values, scale)
+    return day_list
 
-    return (val_0[2], val_1[2])
 
+def evaluate_tasks(function, tasks, pool=None):
+    """Apply the function to every task, either in the worker processes of the pool or serially.
 
-def get_random_candidate(values, scale):
-    """Fetch a random candidate from the supplied values list.
+    :param function: A module-level function (so it can be sent to the worker processes)
+    :param tasks: The list of arguments for the function
+    :param pool: The process pool to use, or None for a serial evaluation
+    :return: The list of results, in the same order as the tasks
+    """
+    if pool is None:
+        return [function(task) for task in tasks]
 
-    Generate a random value R in the range [0, SCALE) and fetch that element from the values list
-    where LOWER <= R < UPPER.
+    if profiler is None:
+        return pool.map(function, tasks, chunksize=1)
 
-    :param values: A list containing triples of the form (LOWER, UPPER, ELEMENT)
-    :param scale: The sum of all fitness values
-    :return: An element from the values list
+    # the workers profile each task on their own, their profilers are merged into the one of this process
+    results = []
+    for (result, worker_profiler) in pool.map(run_profiled, [(function, task) for task in tasks], chunksize=1):
+        profiler.merge(worker_profiler)
+        results.append(result)
+    return results
+
+
+def run_profiled(function_and_task):
+    """Apply the function to the task (in a worker process) with a new profiler.
+
+    :param function_and_task: A tuple of the function and its argument
+    :return: A tuple of the result and the profiler
     """
+    global profiler
+    profiler = Profiler()
+    (function, task) = function_and_task
+    return function(task), profiler
 
-    r = random.random() * scale
-    for v in values:
-        # v[0] -> LOWER
-        # v[1] -> UPPER
-        if v[0] <= r < v[1]:
-            return v
 
+def is_deadline_passed(deadline):
+    """Check if the deadline of the time budget has passed.
 
-def make_fitness_range(values, highest_fitness, lowest_fitness):
-    """Create a list containing triples of the form (LOWER, UPPER, ELEMENT)
+    :param deadline: The deadline (a datetime), or None if there is no time budget
+    :return: True if there is a deadline and it has passed, False otherwise
+    """
+    return (deadline is not None) and (datetime.datetime.now() >= deadline)
 
-    :param values:
-    :return:
+
+def init_worker(problem, parameters):
+    """Initialize a worker process of the process pool.
+
+    The problem instance is only sent to each worker once, instead of once per task.
+    :param problem: The problem instance
+    :param parameters: The parameters of the genetic algorithm
+    :return: nothing
+    """
+    PARAMETERS.update(parameters)
+    set_problem_instance(problem)
+
+
+def set_parameters(parameters):
+    """Change some of the parameters of the genetic algorithm.
+
+    :param parameters: A dictionary with the parameters to change (the others keep their values)
+    :return: nothing
+    """
+    check_parameters(parameters)
+    PARAMETERS.update(parameters)
+
+
+def check_parameters(parameters):
+    """Raise a ValueError if any of the given parameters is not a parameter of the genetic algorithm.
+
+    :param parameters: A dictionary with parameters
+    :return: nothing
+    """
+    unknown_keys = sorted(set(parameters) - set(PARAMETERS))
+    if unknown_keys:
+        raise ValueError('Unknown parameter(s): ' + ', '.join(unknown_keys))
+
+
+def set_problem_instance(problem):
+    """Set the problem instance to solve and precompute the lookup structures derived from it.
+
+    :param problem: The problem instance
+    :return: nothing
+    """
+    global problem_instance, tool_sizes, empty_tool_load, requests_of_tool, customer_grid, day_route_cache, \
+        nearest_customers, distance_rows
+    problem_instance = problem
+    distance_rows = problem['distance'].rows
+    customer_grid = CustomerGrid(problem['customers'])
+    nearest_customers = None
+    if PARAMETERS['route_improvement']:
+        nearest_customers = find_nearest_customers(problem, PARAMETERS['route_improvement_neighbours'])
+    day_route_cache = DayRouteCache(PARAMETERS['day_route_cache_size']) if PARAMETERS['day_route_cache_size'] else None
+
+    empty_tool_load = array('i', [0] * (max(problem['tools']) + 1))
+    tool_sizes = array('i', empty_tool_load)
+    for (tool_id, tool) in problem['tools'].items():
+        tool_sizes[tool_id] = tool.size
+
+    requests_of_tool = [[] for _ in tool_sizes]
+    for request in problem['requests'].values():
+        requests_of_tool[request.tool_id].append(request)
+
+
+def make_selection(population, highest_fitness, lowest_fitness):
+    """Create the function which selects a random candidate of the population for the crossover.
+
+    With the 'selection' 'roulette', candidates are chosen with a chance proportional to their inverted fitness
+    (see make_fitness_range), with 'tournament', the best of 'tournament_size' random candidates is chosen.
+    :param population: The list of candidates
+    :param highest_fitness: The highest fitness in the population
+    :param lowest_fitness: The lowest fitness in the population
+    :return: A function which returns the index of the selected candidate, optionally given a set of indices
+             of candidates which must not be selected
+    """
+    if PARAMETERS['selection'] == 'roulette':
+        cumulative_weights = make_fitness_range(population, highest_fitness, lowest_fitness)
+        debug_print("sum fitness values:", cumulative_weights[-1])
+        return functools.partial(get_random_candidate, cumulative_weights)
+    elif PARAMETERS['selection'] == 'tournament':
+        return functools.partial(get_tournament_winner, population, PARAMETERS['tournament_size'])
+
+    raise Exception('Unknown selection: ' + str(PARAMETERS['selection']))
+
+
+def find_mating_pair(population, select, blocked_pairs=None):
+    """Select a pair of different candidates from the population, which is not in blocked_pairs.
+
+    The second candidate is drawn without the first one and without the candidates it has already been paired with,
+    so even a selection which (nearly) always picks the best candidate cannot get stuck.
+    :param population: The list of candidates
+    :param select: A function which returns the index of a randomly selected candidate (see make_selection)
+    :param blocked_pairs: A set of pairs of indices (the lower one first), which must not be selected again
+    :return: A tuple of the indices of the two candidates
     """
-    great_range = []
-    upper = 0
 
-    for elem in values:
-        # we want that elems with a smaller fitness have a higher chance to be chosen for combination!
-        inverted_fitness = lowest_fitness + (highest_fitness - elem.fit)
-        lower = upper
-        upper = lower + inverted_fitness
-        great_range.append((lower, upper, elem))
+    if len(population) < 2:
+        raise Exception('Population too small')
+
+    if blocked_pairs is None:
+        blocked_pairs = set()
+    if len(blocked_pairs) >= len(population) * (len(population) - 1) // 2:
+        blocked_pairs.clear()  # every pair has been selected, so we have to start over
 
-    return great_range
+    exhausted = set()  # candidates which have already been paired with all others
+    while True:
+        idx_0 = select(exhausted)
+        excluded = {idx for pair in blocked_pairs if idx_0 in pair for idx in pair}
+        excluded.add(idx_0)
+        if len(excluded) < len(population):
+            return (idx_0, select(excluded))
+        exhausted.add(idx_0)
 
 
-def solve_problem(problem):
+def get_random_candidate(cumulative_weights, excluded=()):
+    """Fetch the index of a random candidate, with a chance proportional to its weight.
+
+    Generate a random value R in the range [0, SUM OF WEIGHTS) and find the first candidate
+    whose cumulative weight is greater than R (by binary search). Excluded candidates are drawn again.
+
+    :param cumulative_weights: A list containing the sum of the weights of all candidates up to each index
+    :param excluded: The indices of the candidates which must not be chosen
+    :return: The index of the candidate
+    """
+
+    while True:
+        r = random.random() * cumulative_weights[-1]
+        idx = bisect.bisect_right(cumulative_weights, r)
+        if idx not in excluded:
+            return idx
+
+
+def get_tournament_winner(population, tournament_size, excluded=()):
+    """Fetch the index of the best of several random candidates.
+
+    :param population: The list of candidates
+    :param tournament_size: The number of candidates drawn (with replacement)
+    :param excluded: The indices of the candidates which must not take part
+    :return: The index of the candidate with the lowest fitness among the drawn ones
+    """
+    contestants = []
+    while len(contestants) < tournament_size:
+        idx = random.randrange(len(population))
+        if idx not in excluded:
+            contestants.append(idx)
+    return min(contestants, key=lambda idx: population[idx].fit)
+
+
+def make_fitness_range(values, highest_fitness, lowest_fitness):
+    """Create the list of the cumulative weights of the candidates for the roulette-wheel selection.
+
+    :param values: The list of candidates
+    :param highest_fitness: The highest fitness in the population
+    :param lowest_fitness: The lowest fitness in the population
+    :return: A list containing the sum of the weights of all candidates up to each index
+    """
+    # we want that elems with a smaller fitness have a higher chance to be chosen for combination!
+    return list(itertools.accumulate(lowest_fitness + (highest_fitness - elem.fit) for elem in values))
+
+
+def solve_problem(problem, checkpoint=None):
+    """Solve the problem instance with the genetic algorithm.
+
+    If the parameter 'time_budget' is set (in seconds), the run stops once that much time has passed.
+    Afterwards, STATISTICS holds the number of completed generations and evaluated candidates of the run.
+    If the parameter 'profile' is set, the module's profiler holds the timers and counters of the run.
+    If the parameter 'num_islands' is greater than 1, several populations are evolved in parallel (island model).
+    :param problem: The problem instance
+    :param checkpoint: An optional function, which is called with the best candidate every time it improves
+    :return: The best candidate found
+    """
+    global profiler
     start = datetime.datetime.now()
+    for key in STATISTICS:
+        STATISTICS[key] = 0
+    profiler = Profiler() if PARAMETERS['profile'] else None
     print('Starting now: ' + start.isoformat())
 
-    global problem_instance
-    problem_instance = problem
+    deadline = None
+    if PARAMETERS['time_budget'] is not None:
+        deadline = start + datetime.timedelta(seconds=PARAMETERS['time_budget'])
+
+    set_problem_instance(problem)
+
+    if PARAMETERS['num_islands'] > 1:
+        best_solution = evolve_islands(problem, deadline, checkpoint)
+    else:
+        # the offspring of a generation can be built and evaluated by several worker processes
+        pool = None
+        if PARAMETERS['num_processes'] > 1:
+            pool = multiprocessing.Pool(PARAMETERS['num_processes'], initializer=init_worker,
+                                        initargs=(problem, PARAMETERS))
+
+        try:
+            best_solution = evolve(pool, deadline, checkpoint)
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+    end = datetime.datetime.now()
+    print('Done: ' + end.isoformat())
+    print('Took me: ' + str((end - start).seconds) + 's')
+    return best_solution
+
+
+def evolve(pool=None, deadline=None, checkpoint=None):
+    """Run the genetic algorithm on the problem instance.
+
+    :param pool: An optional process pool, which is used to create and evaluate the offspring in parallel
+    :param deadline: An optional point in time, after which the run is stopped
+    :param checkpoint: An optional function, which is called with the best candidate every time it improves
+    :return: The best candidate found
+    """
 
     # create initial population
-    population = initial_population(PARAMETERS['population_size'])
+    population = initial_population(PARAMETERS['population_size'], pool, deadline)
     population = sorted(population, key=lambda p: p.fit)
     debug_print("population size:", len(population))
+    best_fitness = report_best_candidate(population[0], None, checkpoint)
+    if profiler is not None:
+        print_profile_summary(profiler.end_generation('initial population'))
 
     for i in range(0, PARAMETERS['number_of_generations']):
+        if is_deadline_passed(deadline):
+            debug_print('Time budget exhausted after ' + str(i) + ' generations')
+            break
+
         debug_print('\nIteration: =======' + str(i) + '=======')
 
-        population_sorted = sorted(population, key=lambda p: p.fit)
-        highest_fitness = population_sorted[-1:][0].fit
-        lowest_fitness  = population_sorted[0].fit
+        new_population = evolve_generation(population, pool, deadline)
+        if new_population is None:
+            debug_print('Time budget exhausted during generation ' + str(i))
+            break
+        population = new_population
+
+        debug_print('Best  fitness: ', population[0].fit)
+        debug_print('Worst fitness: ', population[-1] .fit)
+        best_fitness = report_best_candidate(population[0], best_fitness, checkpoint)
+        STATISTICS['generations'] += 1
+        if profiler is not None:
+            print_profile_summary(profiler.end_generation('generation ' + str(i)))
+
+    best_solution = population[0]
+    if best_solution.cars_on_day is None:  # candidates from worker processes or other islands have no routes
+        best_solution.fitness_heuristic()
+    return best_solution  # return the best solution
+
+
+def evolve_islands(problem, deadline=None, checkpoint=None):
+    """Run the genetic algorithm on several populations (islands) at once, each in its own process.
+
+    Every 'migration_interval' generations, each island sends copies of its 'migration_size' best candidates
+    to its neighbours (given by the 'migration_topology'), where they replace the worst candidates.
+    Each island waits for the migrants of its neighbours, so the result only depends on the seed
+    (unless the time budget runs out).
+    :param problem: The problem instance
+    :param deadline: An optional point in time, after which the run is stopped
+    :param checkpoint: An optional function, which is called with the best candidate every time it improves
+    :return: The best candidate found on any of the islands
+    """
+    num_islands = PARAMETERS['num_islands']
+    inboxes = [multiprocessing.Queue() for _ in range(num_islands)]
+    results = multiprocessing.Queue()
+
+    processes = []
+    for island_idx in range(num_islands):
+        targets = migration_targets(island_idx, num_islands, PARAMETERS['migration_topology'])
+        sources = [other_idx for other_idx in range(num_islands)
+                   if island_idx in migration_targets(other_idx, num_islands, PARAMETERS['migration_topology'])]
+        process = multiprocessing.Process(target=evolve_island,
+                                          args=(island_idx, random.getrandbits(32), problem, PARAMETERS, deadline,
+                                                inboxes[island_idx], [inboxes[idx] for idx in targets], sources,
+                                                results))
+        process.daemon = True
+        process.start()
+        processes.append(process)
+
+    # collect the improvements of the islands until all of them are done
+    best_start_days = None
+    best_fitness = None
+    finished_islands = set()
+    failure = None  # the error of an island which found no valid candidate
+    while len(finished_islands) < num_islands:
+        try:
+            message = results.get(timeout=1)
+        except queue.Empty:
+            if any(process.exitcode not in (None, 0) for process in processes):
+                raise Exception('An island terminated unexpectedly')
+            continue
+
+        if message[0] == 'best':
+            (_, island_idx, start_days, fit_) = message
+            if best_fitness is None or fit_ < best_fitness:
+                debug_print('Island {} found a new best fitness: {}'.format(island_idx, fit_))
+                best_start_days = start_days
+                best_fitness = fit_
+                if checkpoint is not None:
+                    candidate = Candidate(array('h', start_days))
+                    candidate.fit = candidate.fitness_heuristic()
+                    checkpoint(candidate)
+        elif message[0] == 'failed':
+            (_, island_idx, failure) = message
+            finished_islands.add(island_idx)
+            debug_print('Island {} failed: {}'.format(island_idx, failure))
+        else:
+            (_, island_idx, statistics, island_profiler) = message
+            finished_islands.add(island_idx)
+            for (key, value) in statistics.items():
+                STATISTICS[key] += value
+            if island_profiler is not None:
+                profiler.merge(island_profiler)
+
+    for process in processes:
+        process.join()
+
+    # the islands which did find a valid candidate are enough for a solution
+    if best_start_days is None:
+        raise NoValidCandidateError(failure)
+
+    best_solution = Candidate(array('h', best_start_days))
+    best_solution.fit = best_solution.fitness_heuristic()
+    return best_solution
+
+
+def migration_targets(island_idx, num_islands, topology):
+    """Find the islands to which an island sends its migrants.
+
+    :param island_idx: The index of the sending island
+    :param num_islands: The number of islands
+    :param topology: 'ring' (to the next island) or 'complete' (to all other islands)
+    :return: The list of indices of the receiving islands
+    """
+    if topology == 'ring':
+        return [(island_idx + 1) % num_islands]
+    elif topology == 'complete':
+        return [other_idx for other_idx in range(num_islands) if other_idx != island_idx]
+
+    raise Exception('Unknown migration topology: ' + str(topology))
+
+
+def evolve_island(island_idx, seed, problem, parameters, deadline, inbox, outboxes, sources, results):
+    """Run the genetic algorithm on a single island (in its own process) and exchange migrants with the others.
+
+    The improvements of the best candidate are sent to the results queue as ('best', ISLAND, START_DAYS, FITNESS),
+    and at the end ('done', ISLAND, STATISTICS, PROFILER) is sent. If the time budget ends before the island has
+    a single valid candidate, ('failed', ISLAND, MESSAGE) is sent instead.
+    :param island_idx: The index of the island
+    :param seed: The seed for the random number generator of the island
+    :param problem: The problem instance
+    :param parameters: The parameters of the genetic algorithm
+    :param deadline: An optional point in time, after which the run is stopped
+    :param inbox: The queue in which the migrants for this island arrive
+    :param outboxes: The queues of the islands to which this island sends its migrants
+    :param sources: The indices of the islands from which this island receives migrants
+    :param results: The queue to report the best candidates and the end of the run to
+    :return: nothing
+    """
+    global profiler
+    PARAMETERS.update(parameters)
+    PARAMETERS['num_processes'] = 1  # the island is the unit of parallelism
+    set_problem_instance(problem)
+    random.seed(seed)
+    for key in STATISTICS:
+        STATISTICS[key] = 0
+    profiler = Profiler() if PARAMETERS['profile'] else None
+    pending_migrants = {source_idx: [] for source_idx in sources}  # migrants which arrived ahead of time
+    active_sources = set(sources)  # the islands which have not finished yet
+
+    try:
+        population = initial_population(PARAMETERS['population_size'], None, deadline)
+    except NoValidCandidateError as e:
+        leave_migration(island_idx, inbox, outboxes, pending_migrants, active_sources)
+        results.put(('failed', island_idx, str(e)))
+        return
+    population = sorted(population, key=lambda p: p.fit)
+    best_fitness = population[0].fit
+    results.put(('best', island_idx, population[0].start_days, best_fitness))
+    if profiler is not None:
+        profiler.end_generation('island {}: initial population'.format(island_idx))
+
+
+    for i in range(0, PARAMETERS['number_of_generations']):
+        if is_deadline_passed(deadline):
+            break
+
+        new_population = evolve_generation(population, None, deadline)
+        if new_population is None:
+            break
+        population = new_population
+        STATISTICS['generations'] += 1
+
+        if (i + 1) % PARAMETERS['migration_interval'] == 0:
+            migrants = [(candidate.start_days, candidate.fit)
+                        for candidate in population[:PARAMETERS['migration_size']]]
+            for outbox in outboxes:
+                outbox.put((island_idx, migrants))
+
+            # each source sends one list of migrants per migration (or a None when it has finished)
+            received = []
+            for source_idx in sources:
+                while (source_idx in active_sources) and not pending_migrants[source_idx]:
+                    receive_migrants(inbox, pending_migrants, active_sources)
+                if pending_migrants[source_idx]:
+                    received.extend(pending_migrants[source_idx].pop(0))
+            population = integrate_migrants(population, received)
+
+        if population[0].fit < best_fitness:
+            best_fitness = population[0].fit
+            results.put(('best', island_idx, population[0].start_days, best_fitness))
+        if profiler is not None:
+            profiler.end_generation('island {}: generation {}'.format(island_idx, i))
+
+    leave_migration(island_idx, inbox, outboxes, pending_migrants, active_sources)
+
+    results.put(('done', island_idx, dict(STATISTICS), profiler))
+
+
+def leave_migration(island_idx, inbox, outboxes, pending_migrants, active_sources):
+    """Tell the other islands that there are no more migrants from an island, and wait until they have finished too.
+
+    The inbox has to be emptied, otherwise the processes which sent to it could not terminate.
+    :param island_idx: The index of the island
+    :param inbox: The queue in which the migrants for the island arrive
+    :param outboxes: The queues of the islands to which the island sends its migrants
+    :param pending_migrants: Key: the index of the sending island, Value: list of the received lists of migrants
+    :param active_sources: The indices of the islands which have not finished yet (gets updated)
+    :return: nothing
+    """
+    for outbox in outboxes:
+        outbox.put((island_idx, None))
+    while active_sources:
+        receive_migrants(inbox, pending_migrants, active_sources)
+
+
+def receive_migrants(inbox, pending_migrants, active_sources):
+    """Wait for the next message in the inbox of an island and store its migrants.
+
+    :param inbox: The queue in which the migrants for the island arrive
+    :param pending_migrants: Key: the index of the sending island, Value: list of the received lists of migrants
+    :param active_sources: The indices of the islands which have not finished yet (gets updated)
+    :return: nothing
+    """
+    (source_idx, migrants) = inbox.get()
+    if migrants is None:
+        active_sources.discard(source_idx)
+    else:
+        pending_migrants[source_idx].append(migrants)
+
+
+def integrate_migrants(population, migrants):
+    """Replace the worst candidates of the population with the migrants.
+
+    Migrants which are already in the population are ignored.
+    :param population: The population, sorted by fitness
+    :param migrants: The list of (START_DAYS, FITNESS) of the migrants (they have been evaluated on their island)
+    :return: The new population, sorted by fitness
+    """
+    population_start_days = {candidate.start_days.tobytes() for candidate in population}
+    new_candidates = []
+    for (start_days, fit_) in migrants:
+        if start_days.tobytes() in population_start_days:
+            continue
+        population_start_days.add(start_days.tobytes())
+
+        # like the candidates from worker processes, the migrants only get their routes rebuilt if needed
+        candidate = Candidate(array('h', start_days))
+        candidate.fit = fit_
+        new_candidates.append(candidate)
+
+    if not new_candidates:
+        return population
 
-        fitness_range = make_fitness_range(population, highest_fitness, lowest_fitness)
-        sum_fitness_values = fitness_range[-1][1] + 1 # the upper bound of the last entry.
-        debug_print("sum fitness values:", sum_fitness_values)
+    population = population[:len(population) - len(new_candidates)] + new_candidates
+    return sorted(population, key=lambda p: p.fit)
 
-        # create new population through crossover
-        new_population = []
-        num_new_candidates = 0
-        blocked_values = []
-        while num_new_candidates < PARAMETERS['population_size'] - PARAMETERS['survivor_size']:
 
-            # select crossover candidates (candidates with higher fitness have a higher chance to get reproduced)
-            (one, two) = find_mating_pair(fitness_range, sum_fitness_values, blocked_values)
-            new_candidate = combine(one, two)
+def evolve_generation(population, pool=None, deadline=None):
+    """Create the next generation of the population.
 
+    :param population: The current population
+    :param pool: An optional process pool, which is used to create and evaluate the offspring in parallel
+    :param deadline: An optional point in time, after which no more children are created
+    :return: The next generation (sorted by fitness), or None if the deadline has passed before it was complete
+    """
+    batch_size = BATCH_SIZE_PER_PROCESS * PARAMETERS['num_processes']
+
+    population_sorted = sorted(population, key=lambda p: p.fit)
+    highest_fitness = population_sorted[-1:][0].fit
+    lowest_fitness  = population_sorted[0].fit
+
+    select = make_selection(population, highest_fitness, lowest_fitness)
+
+    # the start days of the current population, for detecting duplicates
+    population_start_days = {p.start_days.tobytes() for p in population}
+
+    # create new population through crossover
+    new_population = []
+    num_new_candidates = 0
+    blocked_pairs = set()  # pairs of indices of the candidates which have already been selected
+    while num_new_candidates < PARAMETERS['population_size'] - PARAMETERS['survivor_size']:
+        if is_deadline_passed(deadline):
+            break
+
+        # select crossover candidates (candidates with higher fitness have a higher chance to get reproduced)
+        # all the random decisions are made here (the children get their own seeds),
+        # such that the result does not depend on whether we run in parallel
+        tasks = []
+        for _ in range(min(batch_size,
+                           PARAMETERS['population_size'] - PARAMETERS['survivor_size'] - num_new_candidates)):
+            (idx_0, idx_1) = find_mating_pair(population, select, blocked_pairs)
+            # the pair is blocked right away (not only once its child turned out valid),
+            # such that the selection does not depend on the size of the batches
+            blocked_pairs.add((min(idx_0, idx_1), max(idx_0, idx_1)))
+            tasks.append((population[idx_0].start_days, population[idx_1].start_days, random.getrandbits(32)))
+
+        # create, repair, evaluate and mutate the children (in the worker processes, if there are any)
+        evaluated = evaluate_tasks(create_offspring, tasks, pool)
+        STATISTICS['evaluations'] += len(tasks)
+
+        for new_candidate in evaluated:
             if not new_candidate.valid:  # we need to generate an additional candidate
                 continue
 
-            # mutate (happens randomly)
-            new_candidate.mutate()
-
-            if new_candidate in population:  # we need to generate an additional candidate
+            new_start_days = new_candidate.start_days.tobytes()
+            if new_start_days in population_start_days:  # we need to generate an additional candidate
                 debug_print('COMBINATION YIELDED CANDIDATE ALREADY IN POPULATION, IGNORING THIS NEW CANDIDATE')
+                if profiler is not None:
+                    profiler.count('duplicates')
                 continue
 
             new_population.append(new_candidate)
-            blocked_values.append((one, two))
             num_new_candidates += 1
 
-        # select survivors (the best ones survive => the ones with the lowest fitness)
-        population = sorted(population, key=lambda p: p.fit)
-        population = population[:PARAMETERS['survivor_size']]
+    if num_new_candidates < PARAMETERS['population_size'] - PARAMETERS['survivor_size']:
+        # the time budget ran out before the generation was complete
+        return None
 
-        new_population.extend(population)
-        population = new_population
+    # select survivors (the best ones survive => the ones with the lowest fitness)
+    population = sorted(population, key=lambda p: p.fit)
+    population = population[:PARAMETERS['survivor_size']]
 
-        population = sorted(population, key=lambda p: p.fit)
-        debug_print('Best  fitness: ', population[0].fit)
-        population[0].fitness_heuristic()
-        debug_print('Worst fitness: ', population[-1] .fit)
+    new_population.extend(population)
+    return sorted(new_population, key=lambda p: p.fit)
 
-    end = datetime.datetime.now()
-    print('Done: ' + end.isoformat())
-    print('Took me: ' + str((end - start).seconds) + 's')
-    return population[0]  # return the best solution
+
+def print_profile_summary(summary):
+    """Print the timers and counters of a generation on a single line.
+
+    :param summary: The summary of the generation, as created by the profiler
+    :return: nothing
+    """
+    timers = ', '.join('{} {:.3f}s ({})'.format(phase, timer['seconds'], timer['calls'])
+                       for (phase, timer) in sorted(summary['timers'].items()))
+    counters = ', '.join('{} {}'.format(name, amount) for (name, amount) in sorted(summary['counters'].items()))
+    print('Profile of {}: {}; {}'.format(summary['name'], timers, counters))
+
+
+def report_best_candidate(candidate, best_fitness, checkpoint=None):
+    """Pass the best candidate of the population to the checkpoint function, if it is better than the last one.
+
+    :param candidate: The best candidate of the current population
+    :param best_fitness: The fitness of the last reported candidate (or None)
+    :param checkpoint: The function to call with an improved candidate (or None)
+    :return: The fitness of the best candidate reported so far
+    """
+    if (best_fitness is not None) and (candidate.fit >= best_fitness):
+        return best_fitness
+
+    if checkpoint is not None:
+        if candidate.cars_on_day is None:  # candidates from worker processes or other islands have no routes
+            candidate.fitness_heuristic()
+        checkpoint(candidate)
+
+    return candidate.fit
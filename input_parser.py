@@ -1,12 +1,45 @@
 #!/usr/bin/env python3
 
 import sys
+import os
+import random
 import argparse
 import json
 import math
+import hashlib
+import mmap
+import struct
+from array import array
+from xml.etree import ElementTree
 import genetic_solver
 import output_parser
 
+# binary cache of a parsed problem instance (incl. distance matrix), stored next to the instance file:
+# header, dataset and name, tools, customers, requests, padding to 4 bytes, distance matrix (int32, row by row)
+CACHE_SUFFIX = '.cache'
+CACHE_MAGIC = b'PSSAIPRB'
+CACHE_VERSION = 1
+CACHE_HEADER = struct.Struct('<8sI32s7q3I2H')  # magic, version, sha256, 7 scalar values, 3 counts, 2 string lengths
+CACHE_TOOL = struct.Struct('<4q')
+CACHE_CUSTOMER = struct.Struct('<3q')
+CACHE_REQUEST = struct.Struct('<7q')
+CACHE_SCALARS = ['days', 'capacity', 'max_trip_distance', 'depot_coordinate',
+                 'vehicle_cost', 'vehicle_day_cost', 'distance_cost']
+
+# options for the most common parameters of the genetic algorithm: (option, parameter, type)
+PARAMETER_OPTIONS = [('--population-size', 'population_size', int),
+                     ('--generations', 'number_of_generations', int),
+                     ('--mutation-rate', 'mutation_possibility', float),
+                     ('--max-depth-start', 'max_depth_start', int),
+                     ('--max-depth-increase', 'max_depth_increase', int),
+                     ('--max-depth', 'max_depth', int),
+                     ('--time-budget', 'time_budget', float),
+                     ('--processes', 'num_processes', int),
+                     ('--islands', 'num_islands', int)]
+
+# the distance matrix is memory-mapped as it is stored, which only works if the native int is little-endian int32
+CACHE_SUPPORTED = (sys.byteorder == 'little' and array('i').itemsize == 4)
+
 
 class Tool:
     def __init__(self, id, size, num_availabe, cost):
@@ -45,6 +78,34 @@ class Customer:
         return 'CUSTOMER #{}: x={}; y={};'.format(self.id, self.x, self.y)
 
 
+class DistanceMatrix:
+    """Square matrix of the (floored euclidean) distances between all coordinates.
+
+    The distances are stored row by row in one contiguous integer array. Each row is a memoryview into that
+    array, so the matrix can be indexed like the list of lists it replaces: matrix[from_id][to_id]
+    Indexing the matrix is a method call, so frequent lookups index the plain list of rows directly instead:
+    matrix.rows[from_id][to_id]
+    """
+    def __init__(self, size, values):
+        # ctor
+        self.size = size
+        self.values = values
+        view = memoryview(values)
+        self.rows = [view[idx * size:(idx + 1) * size] for idx in range(size)]
+
+    def __getitem__(self, idx):
+        return self.rows[idx]
+
+    def __len__(self):
+        return self.size
+
+    def __reduce__(self):
+        # memoryviews cannot be pickled (e.g. when sending the problem to another process),
+        # and neither can values that are memory-mapped from a cache file
+        values = self.values if isinstance(self.values, array) else array('i', self.values.tobytes())
+        return self.__class__, (self.size, values)
+
+
 class Request:
     def __init__(self, id_, customer_id, first_day, last_day, num_days, tool_id, num_tools):
         # ctor
@@ -70,11 +131,264 @@ class Request:
 
 def main(argv=None):
     parser = argparse.ArgumentParser(description='Genetic algorithm for the VeRoLog Solver Challenge 2017')
-    parser.add_argument('file', help='problem instance, txt-file')
+    parser.add_argument('file', help='problem instance, txt-file or xml-file')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='neither read nor write the binary cache of the parsed problem instance')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='measure the time spent in each phase of the genetic algorithm and write it to FILE (JSON)')
+    parser.add_argument('--seed', type=int,
+                        help='seed for the random number generator (overrides the parameter "seed")')
+    add_parameter_arguments(parser)
     args = parser.parse_args(argv)
 
+    try:
+        parameters = parameters_from_args(args)
+        if args.seed is not None:
+            parameters['seed'] = args.seed
+        genetic_solver.set_parameters(parameters)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if genetic_solver.PARAMETERS['seed'] is not None:
+        random.seed(genetic_solver.PARAMETERS['seed'])
+
+    problem = read_problem(args.file, use_cache=not args.no_cache)
+    # pretty print via json.dumps
+    # print(json.dumps(problem, sort_keys=True, indent=4, default=str))
+
+    # write the best solution found so far every time it improves,
+    # such that a run which gets stopped early still leaves a valid result
+    def checkpoint(candidate):
+        output_parser.create_output_file(problem, candidate, args.file)
+
+    if args.profile:
+        genetic_solver.PARAMETERS['profile'] = True
+
+    try:
+        best_solution = genetic_solver.solve_problem(problem, checkpoint)
+    except genetic_solver.NoValidCandidateError as e:
+        print(e, file=sys.stderr)
+        return 1
+    output_parser.create_output_file(problem, best_solution, args.file)
+
+    if args.profile:
+        with open(args.profile, 'w') as f:
+            json.dump(genetic_solver.profiler.to_dict(), f, indent=2)
+
+
+def add_parameter_arguments(parser):
+    """Add the options for the parameters of the genetic algorithm to the argument parser.
+
+    :param parser: The argument parser
+    :return: nothing
+    """
+    parser.add_argument('--config', metavar='FILE',
+                        help='JSON file with parameters of the genetic algorithm (see PARAMETERS in genetic_solver.py)')
+    parser.add_argument('--set', metavar='KEY=VALUE', action='append', default=[], dest='parameters',
+                        help='set a parameter of the genetic algorithm (the value is read as JSON, if possible), '
+                             'e.g. --set selection=tournament')
+    for (option, key, type_) in PARAMETER_OPTIONS:
+        parser.add_argument(option, type=type_, dest=key, metavar=type_.__name__.upper(),
+                            help='the parameter "{}"'.format(key))
+
+
+def parameters_from_args(args):
+    """Collect the parameters of the genetic algorithm from the parsed arguments (see add_parameter_arguments).
+
+    The parameters in the config file are overridden by those given with --set, which are overridden by
+    those given with their own options.
+    :param args: The parsed arguments
+    :return: A dictionary with the parameters which have been given
+    """
+    parameters = {}
+    if args.config:
+        with open(args.config, 'r') as f:
+            parameters.update(json.load(f))
+    for text in args.parameters:
+        (key, value) = parse_parameter(text)
+        parameters[key] = value
+    for (_, key, _) in PARAMETER_OPTIONS:
+        if getattr(args, key) is not None:
+            parameters[key] = getattr(args, key)
+    return parameters
+
+
+def parse_parameter(text):
+    """Parse a parameter given as KEY=VALUE.
+
+    :param text: The parameter (see parse_value for the value)
+    :return: A tuple (KEY, VALUE)
+    """
+    if '=' not in text:
+        raise ValueError('Parameter "{}" is not of the form KEY=VALUE'.format(text))
+
+    (key, value) = text.split('=', 1)
+    return key, parse_value(value)
+
+
+def parse_value(text):
+    """Read the value of a parameter as JSON (e.g. a number), or as a string if it is no JSON.
+
+    :param text: The value
+    :return: The parsed value
+    """
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def read_problem(filename, use_cache=True):
+    """Read the problem instance from the file and create its distance matrix.
+
+    The format (XML or the tab-separated text format) is chosen by the extension of the file.
+    If use_cache is set, the parsed problem is taken from the binary cache file next to the instance file,
+    as long as that cache was created from the same content. Otherwise, the cache file is (re-)created.
+    :param filename: The name of the file containing the problem instance
+    :param use_cache: Whether the binary cache file should be used
+    :return: The problem instance
+    """
+    use_cache = use_cache and CACHE_SUPPORTED
+    if use_cache:
+        with open(filename, 'rb') as f:
+            content_hash = hashlib.sha256(f.read()).digest()
+        problem = read_problem_cache(filename + CACHE_SUFFIX, content_hash)
+        if problem is not None:
+            return problem
+
+    if filename.lower().endswith('.xml'):
+        problem = read_problem_xml(filename)
+    else:
+        problem = read_problem_txt(filename)
+
+    create_distance_matrix(problem)
+    if use_cache:
+        write_problem_cache(filename + CACHE_SUFFIX, content_hash, problem)
+    return problem
+
+
+def read_problem_cache(filename, content_hash):
+    """Read the problem instance from the binary cache file.
+
+    The distance matrix is not copied, but memory-mapped from the cache file.
+    :param filename: The name of the cache file
+    :param content_hash: The SHA-256 hash of the instance file that the cache should have been created from
+    :return: The problem instance, or None if there is no (up-to-date) cache file
+    """
+    try:
+        with open(filename, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # missing file, or empty file (which cannot be mapped)
+        return None
+
+    try:
+        problem = parse_problem_cache(buffer, content_hash)
+    except (struct.error, UnicodeDecodeError):
+        problem = None
+    if problem is None:  # only a valid cache stays mapped (by its distance matrix)
+        buffer.close()
+    return problem
+
+
+def parse_problem_cache(buffer, content_hash):
+    """Parse the problem instance from the memory-mapped cache file (see read_problem_cache).
+
+    :param buffer: The memory-mapped content of the cache file
+    :param content_hash: The SHA-256 hash of the instance file that the cache should have been created from
+    :return: The problem instance, or None if the cache is not up-to-date or not complete
+    """
+    if len(buffer) < CACHE_HEADER.size:
+        return None
+    (magic, version, cached_hash, *values) = CACHE_HEADER.unpack_from(buffer)
+    scalars = values[:len(CACHE_SCALARS)]
+    (num_tools, num_customers, num_requests, len_dataset, len_name) = values[len(CACHE_SCALARS):]
+    if magic != CACHE_MAGIC or version != CACHE_VERSION or cached_hash != content_hash:
+        return None
+
+    problem = dict(zip(CACHE_SCALARS, scalars))
+    offset = CACHE_HEADER.size
+    problem['dataset'] = buffer[offset:offset + len_dataset].decode('utf-8')
+    offset += len_dataset
+    problem['name'] = buffer[offset:offset + len_name].decode('utf-8')
+    offset += len_name
+
+    problem['tools'] = {}
+    for _ in range(num_tools):
+        tool = Tool(*CACHE_TOOL.unpack_from(buffer, offset))
+        problem['tools'].update({tool.id:tool})
+        offset += CACHE_TOOL.size
+
+    problem['customers'] = {}
+    for _ in range(num_customers):
+        customer = Customer(*CACHE_CUSTOMER.unpack_from(buffer, offset))
+        problem['customers'].update({customer.id:customer})
+        offset += CACHE_CUSTOMER.size
+
+    problem['requests'] = {}
+    for _ in range(num_requests):
+        request = Request(*CACHE_REQUEST.unpack_from(buffer, offset))
+        problem['requests'].update({request.id:request})
+        offset += CACHE_REQUEST.size
+
+    offset += -offset % 4
+    len_matrix = num_customers * num_customers * 4
+    if len(buffer) != offset + len_matrix:
+        return None
+    values = memoryview(buffer)[offset:offset + len_matrix].cast('i')
+    problem['distance'] = DistanceMatrix(num_customers, values)
+    return problem
+
+
+def write_problem_cache(filename, content_hash, problem):
+    """Write the problem instance (incl. distance matrix) to the binary cache file.
+
+    Failing to write the cache (e.g. because the directory is read-only) is not an error.
+    :param filename: The name of the cache file
+    :param content_hash: The SHA-256 hash of the instance file the problem was read from
+    :param problem: The problem instance
+    """
+    dataset = problem['dataset'].encode('utf-8')
+    name = problem['name'].encode('utf-8')
+    chunks = [CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, content_hash, *[problem[key] for key in CACHE_SCALARS],
+                                len(problem['tools']), len(problem['customers']), len(problem['requests']),
+                                len(dataset), len(name)),
+              dataset, name]
+    chunks += [CACHE_TOOL.pack(tool.id, tool.size, tool.num_available, tool.cost)
+               for tool in problem['tools'].values()]
+    chunks += [CACHE_CUSTOMER.pack(customer.id, customer.x, customer.y)
+               for customer in problem['customers'].values()]
+    # the first and last day are stored as they appear in the instance file
+    chunks += [CACHE_REQUEST.pack(request.id, request.customer_id, request.first_day + 1, request.last_day + 1,
+                                  request.num_days, request.tool_id, request.num_tools)
+               for request in problem['requests'].values()]
+
+    length = sum(len(chunk) for chunk in chunks)
+    chunks.append(bytes(-length % 4))
+    chunks.append(problem['distance'].values)
+
+    # write to a temporary file first, such that a cache file is never incomplete
+    # (a file of its own for each process, as several processes may create the cache of an instance at once)
+    filename_temporary = '{}.{}.tmp'.format(filename, os.getpid())
+    try:
+        with open(filename_temporary, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(filename_temporary, filename)
+    except OSError:
+        try:
+            os.remove(filename_temporary)
+        except OSError:
+            pass
+
+
+def read_problem_txt(filename):
+    """Read the problem instance from a file in the tab-separated text format.
+
+    :param filename: The name of the txt-file
+    :return: The problem instance (without distance matrix)
+    """
     # read the file
-    with open(args.file, 'r') as f:
+    with open(filename, 'r') as f:
         lines = [line.strip() for line in f.readlines() if line.strip()]
 
     problem = {}
@@ -126,12 +440,69 @@ def main(argv=None):
                 request = Request.create_from_line(line)
                 problem['requests'].update({request.id:request})
 
-    create_distance_matrix(problem)
-    # pretty print via json.dumps
-    # print(json.dumps(problem, sort_keys=True, indent=4, default=str))
+    return problem
 
-    best_solution = genetic_solver.solve_problem(problem)
-    output_parser.create_output_file(problem, best_solution, args.file)
+
+def read_problem_xml(filename):
+    """Read the problem instance from a file in the XML format.
+
+    The file is parsed incrementally: every node, request and resource element is processed as soon as it is
+    complete and then removed from its parent, so the whole document tree is never held in memory.
+    :param filename: The name of the xml-file
+    :return: The problem instance (without distance matrix)
+    """
+    problem = {}
+    problem['tools'] = {}
+    problem['customers'] = {}
+    problem['requests'] = {}
+    open_elements = []  # elements which have been started but not yet ended, to find the parent of an element
+
+    for (event, elem) in ElementTree.iterparse(filename, events=('start', 'end')):
+        if event == 'start':
+            open_elements.append(elem)
+            if elem.tag == 'instance':
+                problem['days'] = int(elem.get('number_of_days'))
+            continue
+
+        open_elements.pop()
+        parent = open_elements[-1] if open_elements else None
+
+        if elem.tag == 'dataset':
+            problem['dataset'] = elem.text.strip()
+        elif elem.tag == 'name' and parent.tag == 'info':
+            problem['name'] = elem.text.strip()
+
+        elif elem.tag == 'capacity':
+            problem['capacity'] = int(elem.text)
+        elif elem.tag == 'max_travel_distance':
+            problem['max_trip_distance'] = int(elem.text)
+        elif elem.tag == 'departure_node':
+            problem['depot_coordinate'] = int(elem.text)
+
+        elif elem.tag == 'fix_cost':
+            problem['vehicle_cost'] = int(elem.text)
+        elif elem.tag == 'cost_x_time':
+            problem['vehicle_day_cost'] = int(elem.text)
+        elif elem.tag == 'cost_x_distance':
+            problem['distance_cost'] = int(elem.text)
+
+        elif elem.tag == 'node':
+            customer = Customer(elem.get('id'), elem.findtext('cx'), elem.findtext('cy'))
+            problem['customers'].update({customer.id:customer})
+            parent.remove(elem)
+        elif elem.tag == 'request':
+            tool = elem.find('resource')
+            request = Request(elem.get('id'), elem.get('node'), elem.findtext('custom/first_deliver_day'),
+                              elem.findtext('custom/last_deliver_day'), elem.findtext('custom/days_needed'),
+                              tool.get('id'), tool.text)
+            problem['requests'].update({request.id:request})
+            parent.remove(elem)
+        elif elem.tag == 'resource' and parent.tag == 'resources':
+            tool = Tool(elem.get('id'), elem.get('size'), elem.text, elem.get('cost'))
+            problem['tools'].update({tool.id:tool})
+            parent.remove(elem)
+
+    return problem
 
 
 def get_value_from_line(line):
@@ -139,17 +510,17 @@ def get_value_from_line(line):
 
 
 def create_distance_matrix(problem):
-    len_customers = range(len(problem['customers']))
-    problem['distance'] = [[0 for _ in len_customers] for _ in len_customers]
-    for k1, v1 in problem['customers'].items():
-        for k2, v2 in problem['customers'].items():
-            problem['distance'][k1][k2] = distance_between_points(v1, v2)
+    num_customers = len(problem['customers'])
+    coordinates = [(problem['customers'][idx].x, problem['customers'][idx].y) for idx in range(num_customers)]
 
+    # math.isqrt on the exact integer sum of squares yields the same values as flooring the square root,
+    # and each row is computed in a single comprehension instead of one function call per entry
+    values = array('i')
+    for (x, y) in coordinates:
+        values.extend([math.isqrt((x - other_x) * (x - other_x) + (y - other_y) * (y - other_y))
+                       for (other_x, other_y) in coordinates])
 
-def distance_between_points(p1, p2):
-    diff_x = math.fabs(p1.x - p2.x)
-    diff_y = math.fabs(p1.y - p2.y)
-    return math.floor(math.sqrt(math.pow(diff_x, 2) + math.pow(diff_y, 2)))
+    problem['distance'] = DistanceMatrix(num_customers, values)
 
 
 if __name__ == '__main__':
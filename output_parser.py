@@ -1,3 +1,4 @@
+import os
 import sys
 
 
@@ -29,6 +30,11 @@ def create_output_file(problem_instance, best_solution, filename_input):
     filename_input_split = filename_input.rsplit(".", 1)
     filename_output = filename_input_split[0] + ".sol.genetic.txt"
 
-    f = open(filename_output, 'w')
+    # write to a temporary file first and then replace the output file,
+    # such that there is always a complete solution file (even if the program gets killed while writing)
+    # (a file of its own for each process, as several runs may write the solution of an instance at once)
+    filename_temporary = "{}.{}.tmp".format(filename_output, os.getpid())
+    f = open(filename_temporary, 'w')
     f.write(output_str)
     f.close()
+    os.replace(filename_temporary, filename_output)
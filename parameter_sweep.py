@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import argparse
+import itertools
+import multiprocessing.pool
+import input_parser
+import genetic_solver
+import benchmark
+
+
+DEFAULT_OUTPUT = 'benchmarks/sweep.json'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Parameter sweep of the genetic algorithm over the problem instances')
+    parser.add_argument('instances', nargs='+', help='problem instances, txt-files or xml-files')
+    parser.add_argument('--grid', metavar='KEY=VALUES', action='append', default=[],
+                        help='a parameter and its comma-separated values (each read as JSON, if possible), '
+                             'e.g. --grid population_size=50,100; every combination of the values is run')
+    parser.add_argument('--seeds', type=int, nargs='+', default=[1], help='seeds for the runs of each configuration')
+    parser.add_argument('--jobs', type=int, default=multiprocessing.cpu_count(), help='number of runs at the same time')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='seconds after which a run gets killed (default: twice the time budget plus 30, if set)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='file to write the results to')
+    input_parser.add_parameter_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        base_parameters = input_parser.parameters_from_args(args)
+        grid = [parse_grid(text) for text in args.grid]
+        configurations = make_configurations(base_parameters, grid)
+        for parameters in configurations:
+            genetic_solver.check_parameters(parameters)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    runs = [(config_idx, filename, seed)
+            for config_idx in range(len(configurations)) for filename in args.instances for seed in args.seeds]
+
+    def run(config_idx_filename_seed):
+        (config_idx, filename, seed) = config_idx_filename_seed
+        parameters = configurations[config_idx]
+        timeout = args.timeout
+        if timeout is None and parameters.get('time_budget') is not None:
+            timeout = 2 * parameters['time_budget'] + 30
+        return benchmark.run_in_subprocess(filename, seed, parameters, timeout)
+
+    # every run is a separate process (see benchmark.run_in_subprocess), the threads only wait for them
+    results = [{'parameters': parameters, 'runs': []} for parameters in configurations]
+    with multiprocessing.pool.ThreadPool(args.jobs) as pool:
+        for ((config_idx, filename, seed), result) in zip(runs, pool.imap(run, runs)):
+            results[config_idx]['runs'].append(result)
+            print('{} {} (seed {}): {}'.format(format_parameters(configurations[config_idx]), filename, seed,
+                                              benchmark.format_result(result)))
+
+    for result in results:
+        result.update(summarize_runs(result['runs']))
+
+    with open(args.output, 'w') as f:
+        json.dump({'configurations': results}, f, indent=2)
+    print('Results written to ' + args.output)
+
+    print('Configurations by mean cost:')
+    for result in sorted(results, key=lambda r: (r['mean_cost'] is None, r['mean_cost'])):
+        print('    {}: mean_cost={}; mean_wall_time={}s; failed_runs={};'
+              .format(format_parameters(result['parameters']), result['mean_cost'], result['mean_wall_time'],
+                      result['failed_runs']))
+    return 0
+
+
+def parse_grid(text):
+    """Parse a parameter of the grid given as KEY=VALUE,VALUE,...
+
+    :param text: The parameter and its values (see input_parser.parse_value)
+    :return: A tuple (KEY, LIST_OF_VALUES)
+    """
+    if '=' not in text:
+        raise ValueError('Grid parameter "{}" is not of the form KEY=VALUE,VALUE,...'.format(text))
+
+    (key, values) = text.split('=', 1)
+    return key, [input_parser.parse_value(value) for value in values.split(',')]
+
+
+def make_configurations(base_parameters, grid):
+    """Create the parameters of every combination of the values of the grid.
+
+    :param base_parameters: The parameters which are the same for every configuration
+    :param grid: A list of tuples (KEY, LIST_OF_VALUES)
+    :return: A list of dictionaries with the parameters of each configuration
+    """
+    keys = [key for (key, _) in grid]
+    configurations = []
+    for values in itertools.product(*[values for (_, values) in grid]):
+        parameters = dict(base_parameters)
+        parameters.update(zip(keys, values))
+        configurations.append(parameters)
+    return configurations
+
+
+def summarize_runs(runs):
+    """Calculate the mean cost and wall time of the successful runs of a configuration.
+
+    :param runs: The results of the runs (see benchmark.run_instance)
+    :return: A dictionary with the mean cost, the mean wall time and the number of failed runs
+    """
+    successful_runs = [run for run in runs if run['status'] == 'ok']
+    summary = {'mean_cost': None, 'mean_wall_time': None, 'failed_runs': len(runs) - len(successful_runs)}
+    if successful_runs:
+        summary['mean_cost'] = sum(run['cost'] for run in successful_runs) / len(successful_runs)
+        summary['mean_wall_time'] = round(sum(run['wall_time'] for run in successful_runs) / len(successful_runs), 3)
+    return summary
+
+
+def format_parameters(parameters):
+    return ' '.join('{}={}'.format(key, value) for (key, value) in sorted(parameters.items())) or 'defaults'
+
+
+if __name__ == '__main__':
+    exit_code = main()
+    sys.exit(exit_code)
@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import hashlib
+import input_parser
+
+INSTANCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_instances')
+
+
+def problem_summary(problem):
+    """Turn the parsed problem instance into plain values, which can be compared.
+
+    :param problem: The problem instance
+    :return: A dictionary with the scalar values and the attributes of all tools, customers and requests
+    """
+    summary = {key: problem[key] for key in ['dataset', 'name'] + input_parser.CACHE_SCALARS}
+    for key in ['tools', 'customers', 'requests']:
+        summary[key] = {id_: vars(item) for id_, item in problem[key].items()}
+    return summary
+
+
+def test_read_problem_xml():
+    """Parse every ORTEC instance as XML and as text, which have to give the same problem."""
+    for number in range(1, 11):
+        filename = os.path.join(INSTANCES, 'ORTEC_Test_{:02}'.format(number))
+        problem_txt = input_parser.read_problem_txt(filename + '.txt')
+        problem_xml = input_parser.read_problem_xml(filename + '.xml')
+        assert problem_summary(problem_txt) == problem_summary(problem_xml), filename
+
+
+def test_problem_cache():
+    """Write the binary cache of an instance and read it back, which has to give the same problem.
+
+    A cache which is incomplete or was created from another content of the instance file must not be used.
+    """
+    if not input_parser.CACHE_SUPPORTED:
+        return
+
+    source = os.path.join(INSTANCES, 'ORTEC_Test_04.txt')
+    expected = input_parser.read_problem(source, use_cache=False)
+    distances = [list(row) for row in expected['distance'].rows]
+
+    # work on a copy, so that no cache file is left next to the instance
+    directory = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(directory, os.path.basename(source))
+        cache_filename = filename + input_parser.CACHE_SUFFIX
+        shutil.copyfile(source, filename)
+        input_parser.read_problem(filename)  # creates the cache file
+        with open(filename, 'rb') as f:
+            content_hash = hashlib.sha256(f.read()).digest()
+
+        problem = input_parser.read_problem_cache(cache_filename, content_hash)
+        assert problem_summary(problem) == problem_summary(expected)
+        assert [list(row) for row in problem['distance'].rows] == distances
+        assert problem_summary(input_parser.read_problem(filename)) == problem_summary(expected)
+        del problem
+
+        assert input_parser.read_problem_cache(cache_filename, bytes(len(content_hash))) is None
+        with open(cache_filename, 'rb') as f:
+            content = f.read()
+        for length in (0, 20, len(content) - 4):
+            with open(cache_filename + '.incomplete', 'wb') as f:
+                f.write(content[:length])
+            assert input_parser.read_problem_cache(cache_filename + '.incomplete', content_hash) is None
+
+        # after the instance file has changed, the cache is created anew
+        with open(filename, 'a') as f:
+            f.write('\n')
+        with open(filename, 'rb') as f:
+            content_hash = hashlib.sha256(f.read()).digest()
+        assert input_parser.read_problem_cache(cache_filename, content_hash) is None
+        assert problem_summary(input_parser.read_problem(filename)) == problem_summary(expected)
+        assert problem_summary(input_parser.read_problem_cache(cache_filename, content_hash)) == \
+            problem_summary(expected)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    test_read_problem_xml()
+    test_problem_cache()
+    print("All checks passed")
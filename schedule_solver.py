@@ -0,0 +1,117 @@
+import random
+from array import array
+
+try:
+    from ortools.sat.python import cp_model  # optional, see create_schedules
+except ImportError:
+    cp_model = None
+
+
+def is_available():
+    return cp_model is not None
+
+
+def create_schedules(problem, number, time_limit, seed):
+    """Create start days of the requests which respect the available tools and need as few tools as possible.
+
+    The day assignment is modelled as an integer program and solved with the CP-SAT solver of OR-Tools:
+    every request gets one boolean variable per possible start day, and the tools of each type in use on a day
+    are a linear sum of those variables.
+    The tools at a customer's place (like in the repair) must not exceed the available tools.
+    The objective is the cost of the pessimistic maximum of the tools used per day (the tools at a customer's
+    place from the previous day plus the tools delivered on the day), which is an upper bound of the tool cost.
+    Among the schedules with the same tool cost, each schedule prefers other start days (by a random weighting
+    of the start days, which never outweighs the tool cost), such that the schedules differ from each other.
+    :param problem: The problem instance
+    :param number: The number of schedules to create
+    :param time_limit: The number of seconds the solver may take for each schedule
+    :param seed: The seed for the random number generator (for the solver and the random weights)
+    :return: A list of arrays with the start day of each request, indexed by request id
+             (empty if OR-Tools is not installed, shorter if no feasible schedule has been found in time)
+    """
+    if cp_model is None:
+        return []
+
+    rng = random.Random(seed)
+    # the random weights of all start days of a schedule sum up to less than one unit of the tool cost
+    max_weight = 100
+    tool_cost_factor = max_weight * len(problem['requests'])
+
+    schedules = []
+    for _ in range(number):
+        (model, start_vars, tool_cost) = create_model(problem)
+        model.Minimize(tool_cost_factor * tool_cost + sum(rng.randrange(max_weight) * var
+                                                          for vars_of_request in start_vars.values()
+                                                          for var in vars_of_request.values()))
+        start_days = solve_model(problem, model, start_vars, time_limit, rng.getrandbits(31))
+        if start_days is None:
+            break
+        schedules.append(start_days)
+
+    return schedules
+
+
+def create_model(problem):
+    """Create the CP-SAT model of the day assignment.
+
+    :param problem: The problem instance
+    :return: A tuple (MODEL, START_VARS, TOOL_COST), where START_VARS is a dictionary {REQUEST_ID: {DAY: VAR}}
+             and TOOL_COST is the linear expression of the tool cost
+    """
+    model = cp_model.CpModel()
+    num_days = problem['days']
+
+    start_vars = {}
+    # per tool and day: the terms of the tools at a customer's place, and of the tools delivered
+    active_terms = {tool_id: [[] for _ in range(num_days)] for tool_id in problem['tools']}
+    delivery_terms = {tool_id: [[] for _ in range(num_days)] for tool_id in problem['tools']}
+    for (request_id, request) in problem['requests'].items():
+        start_vars[request_id] = {}
+        for start_day in range(request.first_day, request.last_day + 1):
+            var = model.NewBoolVar('start_{}_{}'.format(request_id, start_day))
+            start_vars[request_id][start_day] = var
+            delivery_terms[request.tool_id][start_day].append(request.num_tools * var)
+            for day_idx in range(start_day, start_day + request.num_days):
+                active_terms[request.tool_id][day_idx].append(request.num_tools * var)
+        model.Add(sum(start_vars[request_id].values()) == 1)
+
+    tool_cost = 0
+    for (tool_id, tool) in problem['tools'].items():
+        max_amount = sum(request.num_tools for request in problem['requests'].values() if request.tool_id == tool_id)
+        peak = model.NewIntVar(0, max_amount, 'peak_{}'.format(tool_id))
+        for day_idx in range(num_days):
+            if active_terms[tool_id][day_idx]:
+                model.Add(sum(active_terms[tool_id][day_idx]) <= tool.num_available)
+            previous_terms = active_terms[tool_id][day_idx - 1] if day_idx > 0 else []
+            model.Add(sum(previous_terms) + sum(delivery_terms[tool_id][day_idx]) <= peak)
+        tool_cost += tool.cost * peak
+
+    return model, start_vars, tool_cost
+
+
+def solve_model(problem, model, start_vars, time_limit, seed):
+    """Solve the model and read the start days from the solution.
+
+    :param problem: The problem instance
+    :param model: The model to solve
+    :param start_vars: The variables of the start days, as returned by create_model
+    :param time_limit: The number of seconds the solver may take
+    :param seed: The seed of the solver
+    :return: An array with the start day of each request (indexed by request id), or None if no feasible
+             solution has been found
+    """
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.random_seed = seed
+    solver.parameters.num_search_workers = 1  # the genetic algorithm has its own processes
+    status = solver.Solve(model)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None
+
+    start_days = array('h', [0]) * (len(problem['requests']) + 1)
+    for (request_id, vars_of_request) in start_vars.items():
+        for (start_day, var) in vars_of_request.items():
+            if solver.Value(var):
+                start_days[request_id] = start_day
+    return start_days
+
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+
+import sys
+import argparse
+import input_parser
+
+
+# entries of the optional summary section of a solution file, which are compared to the recomputed values
+SUMMARY_KEYS = ['MAX_NUMBER_OF_VEHICLES', 'NUMBER_OF_VEHICLE_DAYS', 'TOOL_USE', 'DISTANCE', 'COST']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Validator for solutions of the VeRoLog Solver Challenge 2017')
+    parser.add_argument('instance', help='problem instance, txt-file or xml-file')
+    parser.add_argument('solutions', nargs='+', help='solution files (txt-format, simple or extended)')
+    parser.add_argument('--quiet', action='store_true', help='only print the solutions which are not valid')
+    args = parser.parse_args(argv)
+
+    # the validator must not leave a cache file next to the instance
+    problem = input_parser.read_problem(args.instance, use_cache=False)
+    num_invalid = 0
+
+    for filename in args.solutions:
+        try:
+            solution = read_solution(filename)
+            (errors, costs) = validate_solution(problem, solution)
+        except (OSError, ValueError) as e:
+            (errors, costs) = ([str(e)], None)
+
+        if errors:
+            num_invalid += 1
+            print('{}: INVALID'.format(filename))
+            for error in errors:
+                print('    {}'.format(error))
+        elif not args.quiet:
+            print('{}: VALID cost={}; vehicles={}; vehicle_days={}; distance={}; tool_use={};'
+                  .format(filename, costs['cost'], costs['max_number_of_vehicles'], costs['number_of_vehicle_days'],
+                          costs['distance'], ' '.join(str(amount) for amount in costs['tool_use'].values())))
+
+    return 1 if num_invalid else 0
+
+
+def read_solution(filename):
+    """Read a solution in the txt-format (the summary section and the extended V and D lines are optional).
+
+    :param filename: The name of the solution file
+    :return: A dictionary with the dataset, the name, the summary values, the declared number of vehicles per day
+             and the routes per day (day index -> list of (vehicle ID, list of stops))
+    """
+    solution = {'dataset': None, 'name': None, 'summary': {}, 'num_vehicles': {}, 'routes': {}}
+    day_idx = None
+
+    with open(filename, 'r') as f:
+        for (line_idx, line) in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+
+            if '=' in line:
+                (key, value) = [part.strip() for part in line.split('=', 1)]
+                if key == 'DATASET':
+                    solution['dataset'] = value
+                elif key == 'NAME':
+                    solution['name'] = value
+                elif key == 'DAY':
+                    day_idx = int(value) - 1  # for convenience when working with arrays of day-numbers
+                    solution['routes'].setdefault(day_idx, [])
+                elif key == 'NUMBER_OF_VEHICLES':
+                    solution['num_vehicles'][day_idx] = int(value)
+                elif key == 'TOOL_USE':
+                    solution['summary'][key] = [int(amount) for amount in value.split()]
+                elif key in SUMMARY_KEYS:
+                    solution['summary'][key] = int(value)
+                # everything else (e.g. START_DEPOT and FINISH_DEPOT) is derived information only
+                continue
+
+            fields = line.split()
+            if len(fields) < 2 or day_idx is None:
+                raise ValueError('{}:{}: unexpected line "{}"'.format(filename, line_idx, line))
+            if fields[1] == 'R':
+                stops = [int(stop) for stop in fields[2:]]
+                solution['routes'][day_idx].append((int(fields[0]), stops))
+            elif fields[1] not in ('V', 'D'):
+                raise ValueError('{}:{}: unexpected line "{}"'.format(filename, line_idx, line))
+
+    return solution
+
+
+def validate_solution(problem, solution):
+    """Check the feasibility of the solution and recompute its cost.
+
+    Every trip of a vehicle starts with the tools it needs (the maximum over its prefixes of the delivered tools
+    which have not been fetched before on the same trip), and ends with the tools which are left over.
+    A vehicle takes tools from the depot and brings tools back at each of its visits at the depot.
+    The tools used on a day are those at the customers at the start of the day, plus the most tools
+    that each vehicle has taken from the depot at any time during the day.
+    :param problem: The problem instance
+    :param solution: The solution as returned by read_solution
+    :return: A tuple of the list of errors (empty if the solution is valid) and the dictionary of costs
+    """
+    errors = []
+    num_days = problem['days']
+    capacity = problem['capacity']
+    max_trip_distance = problem['max_trip_distance']
+    depot = problem['depot_coordinate']
+    distance = problem['distance'].rows
+    tools = problem['tools']
+    requests = problem['requests']
+
+    if solution['dataset'] != problem['dataset'] or solution['name'] != problem['name']:
+        errors.append('solution is for dataset "{}", name "{}"'.format(solution['dataset'], solution['name']))
+
+    delivery_day = {}
+    fetch_day = {}
+    # per tool and day: the change of the tools at the depot, and the sum of the largest withdrawals of each vehicle
+    depot_change = {tool_id: [0] * num_days for tool_id in tools}
+    depot_withdrawal = {tool_id: [0] * num_days for tool_id in tools}
+    max_cars = 0
+    sum_cars = 0
+    sum_distance = 0
+
+    for (day_idx, routes) in sorted(solution['routes'].items()):
+        if not 0 <= day_idx < num_days:
+            errors.append('day {}: outside of the planning horizon'.format(day_idx + 1))
+            continue
+        declared_vehicles = solution['num_vehicles'].get(day_idx)
+        if declared_vehicles is not None and declared_vehicles != len(routes):
+            errors.append('day {}: {} vehicles declared, {} routes given'
+                          .format(day_idx + 1, declared_vehicles, len(routes)))
+        if len(set(vehicle_id for (vehicle_id, _) in routes)) != len(routes):
+            errors.append('day {}: a vehicle has more than one route'.format(day_idx + 1))
+
+        max_cars = max(max_cars, len(routes))
+        sum_cars += len(routes)
+
+        for (vehicle_id, stops) in routes:
+            where = 'day {}, vehicle {}'.format(day_idx + 1, vehicle_id)
+            if len(stops) < 2 or stops[0] != 0 or stops[-1] != 0:
+                errors.append('{}: route does not start and end at the depot'.format(where))
+                continue
+
+            # the tools of the vehicle (i.e. the change at the depot so far), and the lowest it has been
+            vehicle_balance = {}
+            vehicle_lowest = {}
+            route_distance = 0
+            last_coordinate = depot
+            trip_balance = {}  # per tool: delivered minus fetched tools, since the last visit at the depot
+            trip_needed = {}   # per tool: the maximum of trip_balance (i.e. what has to be loaded at the depot)
+            weighted_balance = 0
+            lowest_weighted_balance = 0
+
+            for stop in stops[1:]:
+                if stop == 0:
+                    coordinate = depot
+                else:
+                    request = requests.get(abs(stop))
+                    if request is None:
+                        errors.append('{}: unknown request {}'.format(where, abs(stop)))
+                        continue
+                    coordinate = request.customer_id
+                route_distance += distance[last_coordinate][coordinate]
+                last_coordinate = coordinate
+
+                if stop == 0:
+                    # end of the trip: check the capacity, then settle the loaded and returned tools with the depot
+                    load = sum(tools[tool_id].size * needed for (tool_id, needed) in trip_needed.items())
+                    if load - lowest_weighted_balance > capacity:
+                        errors.append('{}: capacity exceeded ({} > {})'
+                                      .format(where, load - lowest_weighted_balance, capacity))
+                    for (tool_id, needed) in trip_needed.items():
+                        balance = vehicle_balance.get(tool_id, 0) - needed
+                        vehicle_lowest[tool_id] = min(vehicle_lowest.get(tool_id, 0), balance)
+                        vehicle_balance[tool_id] = balance + needed - trip_balance[tool_id]
+                    trip_balance = {}
+                    trip_needed = {}
+                    weighted_balance = 0
+                    lowest_weighted_balance = 0
+                    continue
+
+                tool_id = request.tool_id
+                size = tools[tool_id].size
+                if stop > 0:
+                    if stop in delivery_day:
+                        errors.append('request {}: delivered more than once'.format(stop))
+                    delivery_day[stop] = day_idx
+                    balance = trip_balance.get(tool_id, 0) + request.num_tools
+                    trip_balance[tool_id] = balance
+                    trip_needed[tool_id] = max(trip_needed.get(tool_id, 0), balance)
+                    weighted_balance += size * request.num_tools
+                else:
+                    if -stop in fetch_day:
+                        errors.append('request {}: fetched more than once'.format(-stop))
+                    fetch_day[-stop] = day_idx
+                    trip_balance[tool_id] = trip_balance.get(tool_id, 0) - request.num_tools
+                    trip_needed.setdefault(tool_id, 0)
+                    weighted_balance -= size * request.num_tools
+                    lowest_weighted_balance = min(lowest_weighted_balance, weighted_balance)
+
+            if route_distance > max_trip_distance:
+                errors.append('{}: distance exceeded ({} > {})'.format(where, route_distance, max_trip_distance))
+            sum_distance += route_distance
+
+            for (tool_id, balance) in vehicle_balance.items():
+                depot_change[tool_id][day_idx] += balance
+                depot_withdrawal[tool_id][day_idx] -= vehicle_lowest[tool_id]
+
+    for (req_id, request) in requests.items():
+        if req_id not in delivery_day:
+            errors.append('request {}: not delivered'.format(req_id))
+        elif not request.first_day <= delivery_day[req_id] <= request.last_day:
+            errors.append('request {}: delivered on day {}, outside of its window'
+                          .format(req_id, delivery_day[req_id] + 1))
+        elif fetch_day.get(req_id) != delivery_day[req_id] + request.num_days:
+            errors.append('request {}: not fetched on day {}'.format(req_id, delivery_day[req_id] + request.num_days + 1))
+
+    tool_use = {}
+    for (tool_id, tool) in tools.items():
+        used = 0  # tools at the customers at the start of the day
+        max_used = 0
+        for day_idx in range(num_days):
+            max_used = max(max_used, used + depot_withdrawal[tool_id][day_idx])
+            used -= depot_change[tool_id][day_idx]
+        tool_use[tool_id] = max_used
+        if max_used > tool.num_available:
+            errors.append('tool {}: {} used, {} available'.format(tool_id, max_used, tool.num_available))
+
+    costs = {'max_number_of_vehicles': max_cars,
+             'number_of_vehicle_days': sum_cars,
+             'tool_use': tool_use,
+             'distance': sum_distance}
+    costs['cost'] = max_cars     * problem['vehicle_cost']     + \
+                    sum_cars     * problem['vehicle_day_cost'] + \
+                    sum_distance * problem['distance_cost']    + \
+                    sum(amount * tools[tool_id].cost for (tool_id, amount) in tool_use.items())
+
+    # compare with the summary section of the solution (if there is one)
+    recomputed = {'MAX_NUMBER_OF_VEHICLES': max_cars, 'NUMBER_OF_VEHICLE_DAYS': sum_cars,
+                  'TOOL_USE': list(tool_use.values()), 'DISTANCE': sum_distance, 'COST': costs['cost']}
+    for (key, value) in solution['summary'].items():
+        if value != recomputed[key]:
+            errors.append('{} is stated as {}, but is {}'.format(key, value, recomputed[key]))
+
+    return errors, costs
+
+
+if __name__ == '__main__':
+    exit_code = main()
+    sys.exit(exit_code)
@@ -0,0 +1,412 @@
+import itertools
+import os
+import pickle
+import random
+from array import array
+import input_parser
+import genetic_solver
+
+INSTANCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_instances', 'ORTEC_Test_04')
+
+genetic_solver.dbg = False
+
+
+def load_problem():
+    """Read the test instance and set it as the problem instance of the solver.
+
+    :return: The problem instance
+    """
+    problem = input_parser.read_problem(INSTANCE + '.txt', use_cache=False)
+    genetic_solver.set_problem_instance(problem)
+    return problem
+
+
+def valid_candidates(number):
+    """Create random candidates, which are repaired and evaluated.
+
+    :param number: The number of valid candidates to create
+    :return: The list of candidates
+    """
+    candidates = []
+    seed = 0
+    while len(candidates) < number:
+        candidate = genetic_solver.create_random_candidate(seed)
+        if candidate.valid:
+            candidates.append(candidate)
+        seed += 1
+    return candidates
+
+
+def test_update_fitness():
+    """Mutate candidates at random, the updated fitness always has to equal the fitness calculated from scratch."""
+    load_problem()
+    rng = random.Random(1)
+    mutation_possibility = genetic_solver.PARAMETERS['mutation_possibility']
+    genetic_solver.PARAMETERS['mutation_possibility'] = 1.0
+    try:
+        for candidate in valid_candidates(3):
+            # a candidate from a worker process only has the per-day costs, not the routes
+            for candidate in (candidate, pickle.loads(pickle.dumps(candidate))):
+                for _ in range(20):
+                    candidate.mutate(rng)
+                    fit_ = genetic_solver.Candidate(array('h', candidate.start_days)).fitness_heuristic()
+                    assert candidate.fit == fit_, (candidate.fit, fit_)
+                    if not candidate.valid:
+                        break
+    finally:
+        genetic_solver.PARAMETERS['mutation_possibility'] = mutation_possibility
+
+
+def load_profile(stopovers):
+    """Calculate the load profile of a trip from scratch (see Trip.try_add).
+
+    :param stopovers: The stopovers of the trip (without the depot)
+    :return: A tuple (DEPOT_LOAD, END_LOAD, MAX_SIZE, DISTANCE), the loads are lists indexed by tool id
+    """
+    problem = genetic_solver.problem_instance
+    num_tools = len(genetic_solver.tool_sizes)
+    # the tools loaded at the depot are the least which never let the load of a tool become negative
+    depot_load = [0] * num_tools
+    balance = [0] * num_tools
+    for stopover in stopovers:
+        tool_id = problem['requests'][stopover.request_id].tool_id
+        balance[tool_id] -= stopover.num_tools
+        depot_load[tool_id] = max(depot_load[tool_id], -balance[tool_id])
+
+    load = list(depot_load)
+    max_size = sum(amount * size for (amount, size) in zip(load, genetic_solver.tool_sizes))
+    for stopover in stopovers:
+        load[problem['requests'][stopover.request_id].tool_id] -= stopover.num_tools
+        max_size = max(max_size, sum(amount * size for (amount, size) in zip(load, genetic_solver.tool_sizes)))
+
+    customers = [0] + [stopover.customer_id for stopover in stopovers] + [0]
+    distance = sum(problem['distance'][a][b] for (a, b) in zip(customers, customers[1:]))
+    return depot_load, load, max_size, distance
+
+
+def test_trip_load():
+    """Add random stopovers to trips, which have to accept exactly those that fit, with the right load profile."""
+    problem = load_problem()
+    rng = random.Random(1)
+    requests = list(problem['requests'].values())
+    for _ in range(200):
+        trip = genetic_solver.Trip()
+        stopovers = []
+        for _ in range(rng.randint(1, 15)):
+            request = rng.choice(requests)
+            num_tools = request.num_tools if rng.random() < 0.5 else -request.num_tools
+            stopover = genetic_solver.StopOver(request.customer_id, request.id, num_tools)
+
+            (_, _, max_size, distance) = load_profile(stopovers + [stopover])
+            fits = (max_size <= problem['capacity']) and (distance <= problem['max_trip_distance'])
+            assert trip.try_add(stopover) == fits
+            if fits:
+                stopovers.append(stopover)
+
+        trip.finalize()
+        (depot_load, end_load, max_size, distance) = load_profile(stopovers)
+        assert list(trip.depot_load) == depot_load
+        assert list(trip.current_load) == end_load
+        assert trip.max_size == max_size
+        assert trip.distance == distance
+
+
+def test_pop_nearest():
+    """Pop pending requests one by one, each has to be the nearest one (by distance, then rank) of a linear scan."""
+    problem = load_problem()
+    rng = random.Random(1)
+    for _ in range(50):
+        request_ids = rng.sample(sorted(problem['requests']), rng.randint(1, 80))
+        pending = [(rank, req_id, problem['requests'][req_id].customer_id) for (rank, req_id) in enumerate(request_ids)]
+        pending_requests = genetic_solver.PendingRequests((req_id, customer_id) for (_, req_id, customer_id) in pending)
+
+        customer_id = rng.choice([0] + [customer_id for (_, _, customer_id) in pending])
+        while pending:
+            distances = problem['distance'][customer_id]
+            nearest = min(pending, key=lambda entry: (distances[entry[2]], entry[0]))
+            assert pending_requests.pop_nearest(customer_id) == nearest[1]
+            pending.remove(nearest)
+            customer_id = nearest[2]
+        assert len(pending_requests) == 0
+
+
+def usage_changes_of_tool(tool_id, start_days):
+    """Calculate the difference array of the usages of a tool from scratch (see genetic_solver.add_usage_changes).
+
+    :param tool_id: The id of the tool
+    :param start_days: An array with the start day of each request, indexed by request id
+    :return: The difference array (one entry per day, and one more)
+    """
+    usage_changes = [0] * (genetic_solver.problem_instance['days'] + 1)
+    for request in genetic_solver.requests_of_tool[tool_id]:
+        genetic_solver.add_usage_changes(usage_changes, request, start_days[request.id], 1)
+    return usage_changes
+
+
+def test_undo_log():
+    """Make random moves and revert them, which has to restore the start days and the usages exactly."""
+    problem = load_problem()
+    rng = random.Random(1)
+    for candidate in valid_candidates(2):
+        for tool_id in problem['tools']:
+            start_days = array('h', candidate.start_days)
+            usage_changes = usage_changes_of_tool(tool_id, start_days)
+            undo_log = []
+            states = []
+            for _ in range(30):
+                states.append((array('h', start_days), list(usage_changes)))
+                request = rng.choice(genetic_solver.requests_of_tool[tool_id])
+                start_day = rng.randint(request.first_day, request.last_day)
+                genetic_solver.apply_move(request, start_day, start_days, usage_changes, undo_log)
+                assert usage_changes == usage_changes_of_tool(tool_id, start_days)
+
+            while undo_log:
+                genetic_solver.revert_move(start_days, usage_changes, undo_log)
+                assert (start_days, usage_changes) == states.pop()
+            assert start_days == candidate.start_days
+
+
+def test_repair():
+    """Repair random schedules, which must neither change the given schedule nor, if it fails, the candidate."""
+    problem = load_problem()
+    rng = random.Random(1)
+    schedules = []
+    for _ in range(60):
+        start_days = array('h', [0]) * (len(problem['requests']) + 1)
+        for request in problem['requests'].values():
+            start_days[request.id] = rng.randint(request.first_day, request.last_day)
+        schedules.append(start_days)
+
+    max_depths = (genetic_solver.PARAMETERS['max_depth_start'], genetic_solver.PARAMETERS['max_depth'])
+    num_repaired = 0
+    num_failed = 0
+    try:
+        # without a search depth, some of the repairs fail
+        for max_depth in (0, max_depths[1]):
+            genetic_solver.PARAMETERS['max_depth_start'] = min(max_depths[0], max_depth)
+            genetic_solver.PARAMETERS['max_depth'] = max_depth
+            for start_days in schedules:
+                given_start_days = array('h', start_days)
+                candidate = genetic_solver.Candidate(start_days)
+                candidate.repair()
+
+                assert start_days == given_start_days
+                if not candidate.valid:
+                    assert candidate.start_days == given_start_days
+                    num_failed += 1
+                    continue
+                num_repaired += candidate.start_days != given_start_days
+                for request in problem['requests'].values():
+                    assert request.first_day <= candidate.start_days[request.id] <= request.last_day
+    finally:
+        (genetic_solver.PARAMETERS['max_depth_start'], genetic_solver.PARAMETERS['max_depth']) = max_depths
+    assert num_repaired > 0 and num_failed > 0, (num_repaired, num_failed)
+
+
+def test_get_random_candidate():
+    """The binary search of the roulette wheel has to pick the same candidate as a linear scan, never an excluded one."""
+    rng = random.Random(1)
+    for _ in range(200):
+        weights = [rng.randint(1, 100) for _ in range(rng.randint(2, 30))]
+        cumulative_weights = list(itertools.accumulate(weights))
+        excluded = set(rng.sample(range(len(weights)), rng.randint(0, len(weights) - 1)))
+
+        state = random.getstate()
+        idx = genetic_solver.get_random_candidate(cumulative_weights, excluded)
+        random.setstate(state)
+        while True:
+            r = random.random() * cumulative_weights[-1]
+            expected = next(idx for (idx, weight) in enumerate(cumulative_weights) if weight > r)
+            if expected not in excluded:
+                break
+        assert idx == expected
+
+
+def test_find_mating_pair():
+    """Select all pairs of a population, each exactly once, even if the selection (nearly) always picks the best."""
+    rng = random.Random(1)
+    selection = (genetic_solver.PARAMETERS['selection'], genetic_solver.PARAMETERS['tournament_size'])
+    try:
+        for (selection_name, tournament_size) in [('roulette', 3), ('tournament', 2), ('tournament', 10),
+                                                  ('tournament', 100)]:
+            genetic_solver.PARAMETERS['selection'] = selection_name
+            genetic_solver.PARAMETERS['tournament_size'] = tournament_size
+            population = []
+            for _ in range(10):
+                candidate = genetic_solver.Candidate(array('h', [0]))
+                candidate.fit = rng.randint(1000, 2000)
+                population.append(candidate)
+            fits = [candidate.fit for candidate in population]
+            select = genetic_solver.make_selection(population, max(fits), min(fits))
+
+            blocked_pairs = set()
+            num_pairs = len(population) * (len(population) - 1) // 2
+            for _ in range(num_pairs):
+                (idx_0, idx_1) = genetic_solver.find_mating_pair(population, select, blocked_pairs)
+                pair = (min(idx_0, idx_1), max(idx_0, idx_1))
+                assert idx_0 != idx_1 and pair not in blocked_pairs
+                blocked_pairs.add(pair)
+            assert len(blocked_pairs) == num_pairs
+    finally:
+        (genetic_solver.PARAMETERS['selection'], genetic_solver.PARAMETERS['tournament_size']) = selection
+
+
+def random_requests_of_day(problem, rng, number):
+    """Pick random requests, each to be delivered or fetched (like the non-critical requests of a day).
+
+    :param problem: The problem instance
+    :param rng: The random number generator
+    :param number: The number of requests
+    :return: A dictionary {REQUEST_ID: 'deliver' or 'fetch'}
+    """
+    return {req_id: rng.choice(['deliver', 'fetch']) for req_id in rng.sample(sorted(problem['requests']), number)}
+
+
+def test_assign_trips_to_cars():
+    """Assign random trips to cars by every method, each trip has to end up in exactly one car within its distance."""
+    problem = load_problem()
+    rng = random.Random(1)
+    car_assignment = (genetic_solver.PARAMETERS['car_assignment'],
+                      genetic_solver.PARAMETERS['car_assignment_improvement'])
+    try:
+        for _ in range(30):
+            empty_trip = genetic_solver.Trip()
+            empty_trip.finalize()
+            trips = genetic_solver.create_nearest_neighbour_trips(random_requests_of_day(problem, rng, 60))
+            trips.insert(rng.randint(0, len(trips)), empty_trip)  # trips without any stops are dropped
+
+            num_cars = {}
+            for method in ('next_fit', 'first_fit_decreasing', 'best_fit_decreasing'):
+                for improvement in (False, True):
+                    genetic_solver.PARAMETERS['car_assignment'] = method
+                    genetic_solver.PARAMETERS['car_assignment_improvement'] = improvement
+                    cars = genetic_solver.assign_trips_to_cars(trips)
+
+                    assigned = [trip for car in cars for trip in car]
+                    assert sorted(map(id, assigned)) == sorted(id(trip) for trip in trips if trip is not empty_trip)
+                    for car in cars:
+                        assert car
+                        assert sum(trip.distance for trip in car) <= problem['max_trip_distance']
+                        assert [trips.index(trip) for trip in car] == sorted(trips.index(trip) for trip in car)
+                    num_cars[(method, improvement)] = len(cars)
+                if method != 'next_fit':
+                    assert num_cars[(method, True)] <= num_cars[(method, False)]
+    finally:
+        (genetic_solver.PARAMETERS['car_assignment'],
+         genetic_solver.PARAMETERS['car_assignment_improvement']) = car_assignment
+
+
+def random_trips(problem, rng, number):
+    """Build trips of random requests, visited in random order.
+
+    :param problem: The problem instance
+    :param rng: The random number generator
+    :param number: The number of requests
+    :return: The list of finished trips
+    """
+    stopovers = []
+    for (req_id, action) in random_requests_of_day(problem, rng, number).items():
+        request = problem['requests'][req_id]
+        num_tools = request.num_tools if action == 'deliver' else -request.num_tools
+        stopovers.append(genetic_solver.StopOver(request.customer_id, req_id, num_tools))
+
+    trips = [genetic_solver.Trip()]
+    for stopover in stopovers:
+        if not trips[-1].try_add(stopover):
+            trips.append(genetic_solver.Trip())
+            assert trips[-1].try_add(stopover)
+    for trip in trips:
+        trip.finalize()
+    return trips
+
+
+def test_improve_trip():
+    """Improve trips in random order, each keeps its requests, is valid, and gets no longer and needs no more tools."""
+    route_improvement = genetic_solver.PARAMETERS['route_improvement']
+    try:
+        genetic_solver.PARAMETERS['route_improvement'] = True  # the nearest customers are found with the instance
+        problem = load_problem()
+        rng = random.Random(2)
+        num_improved = 0
+        for _ in range(20):
+            for trip in random_trips(problem, rng, 40):
+                stopovers = sorted((stopover.request_id, stopover.num_tools) for stopover in trip.stopovers)
+                improved_trip = genetic_solver.improve_trip(trip)
+
+                assert sorted((stopover.request_id, stopover.num_tools)
+                              for stopover in improved_trip.stopovers) == stopovers
+                assert improved_trip.stopovers[0].customer_id == improved_trip.stopovers[-1].customer_id == 0
+                (depot_load, _, max_size, distance) = load_profile(improved_trip.stopovers[1:-1])
+                assert improved_trip.distance == distance <= problem['max_trip_distance']
+                assert max_size <= problem['capacity']
+                assert improved_trip.distance <= trip.distance
+                assert all(new <= old for (new, old) in zip(depot_load, trip.depot_load))
+                num_improved += improved_trip.distance < trip.distance
+        assert num_improved > 0
+    finally:
+        genetic_solver.PARAMETERS['route_improvement'] = route_improvement
+
+
+def test_create_savings_trips():
+    """Build savings trips of random requests, each request is visited once, and the trips are valid and no longer
+    than a trip per request (also with a shorter maximum distance, as the capacity is usually reached first)."""
+    problem = load_problem()
+    rng = random.Random(3)
+    # every request still fits into a trip of its own
+    shortest = 2 * max(problem['distance'][0][request.customer_id] for request in problem['requests'].values())
+    try:
+        for (number, max_trip_distance) in itertools.product((0, 1, 2, 5, 20, 60, 150),
+                                                             (problem['max_trip_distance'], shortest)):
+            genetic_solver.set_problem_instance(dict(problem, max_trip_distance=max_trip_distance))
+            non_critical_requests = random_requests_of_day(problem, rng, number)
+            trips = genetic_solver.create_savings_trips(non_critical_requests)
+
+            stopovers = [stopover for trip in trips for stopover in trip.stopovers[1:-1]]
+            assert sorted(stopover.request_id for stopover in stopovers) == sorted(non_critical_requests)
+            for stopover in stopovers:
+                request = problem['requests'][stopover.request_id]
+                assert stopover.customer_id == request.customer_id
+                deliver = non_critical_requests[stopover.request_id] == 'deliver'
+                assert stopover.num_tools == (request.num_tools if deliver else -request.num_tools)
+
+            for trip in trips:
+                assert trip.stopovers[0].customer_id == trip.stopovers[-1].customer_id == 0
+                (_, _, max_size, distance) = load_profile(trip.stopovers[1:-1])
+                assert trip.distance == distance <= max_trip_distance
+                assert max_size <= problem['capacity']
+            assert (sum(trip.distance for trip in trips)
+                    <= sum(2 * problem['distance'][0][stopover.customer_id] for stopover in stopovers))
+    finally:
+        genetic_solver.set_problem_instance(problem)
+
+
+def test_min_cost_assignment():
+    """Compare the Hungarian method with a brute force search over all assignments of small random matrices."""
+    rng = random.Random(1)
+    for _ in range(300):
+        num_rows = rng.randint(1, 5)
+        num_cols = rng.randint(num_rows, 6)
+        costs = [[rng.randint(0, 20) for _ in range(num_cols)] for _ in range(num_rows)]
+
+        assignment = genetic_solver.min_cost_assignment(costs)
+        assert len(set(assignment)) == num_rows
+        assert all(0 <= col < num_cols for col in assignment)
+
+        best = min(sum(costs[row][col] for row, col in enumerate(cols))
+                   for cols in itertools.permutations(range(num_cols), num_rows))
+        assert sum(costs[row][col] for row, col in enumerate(assignment)) == best, costs
+
+
+if __name__ == "__main__":
+    test_update_fitness()
+    test_trip_load()
+    test_pop_nearest()
+    test_undo_log()
+    test_repair()
+    test_get_random_candidate()
+    test_find_mating_pair()
+    test_assign_trips_to_cars()
+    test_improve_trip()
+    test_create_savings_trips()
+    test_min_cost_assignment()
+    print("All checks passed")
@@ -0,0 +1,84 @@
+import os
+import copy
+import shutil
+import tempfile
+import input_parser
+import output_parser
+import genetic_solver
+import solution_validator
+
+INSTANCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_instances')
+
+genetic_solver.dbg = False
+
+
+def test_validate_given_solutions():
+    """The solutions which come with the ORTEC instances (simple and extended) are valid and cost what they state."""
+    for number in range(1, 11):
+        filename = os.path.join(INSTANCES, 'ORTEC_Test_{:02}'.format(number))
+        problem = input_parser.read_problem(filename + '.txt', use_cache=False)
+        for suffix in ('.sol.txt', '.sol_extended.txt'):
+            solution = solution_validator.read_solution(filename + suffix)
+            (errors, costs) = solution_validator.validate_solution(problem, solution)
+            assert errors == [], (filename + suffix, errors)
+            assert costs['cost'] == solution['summary'].get('COST', costs['cost'])
+
+
+def test_validate_invalid_solutions():
+    """Break a valid solution (or tighten its problem instance) in several ways, each has to be reported."""
+    filename = os.path.join(INSTANCES, 'ORTEC_Test_04')
+    problem = input_parser.read_problem(filename + '.txt', use_cache=False)
+    solution = solution_validator.read_solution(filename + '.sol.txt')
+
+    def errors_of(problem_changes=None, change_solution=None):
+        changed_problem = dict(problem, **(problem_changes or {}))
+        changed_solution = copy.deepcopy(solution)
+        if change_solution is not None:
+            change_solution(changed_solution)
+        return solution_validator.validate_solution(changed_problem, changed_solution)[0]
+
+    def remove_first_delivery(changed_solution):
+        stops = changed_solution['routes'][0][0][1]
+        stops.remove(next(stop for stop in stops if stop > 0))
+
+    def state_other_cost(changed_solution):
+        changed_solution['summary']['COST'] = 1
+
+    assert errors_of() == []
+    assert any('not delivered' in error for error in errors_of(change_solution=remove_first_delivery))
+    assert any('COST' in error for error in errors_of(change_solution=state_other_cost))
+    assert any('capacity exceeded' in error for error in errors_of({'capacity': problem['capacity'] // 4}))
+    assert any('distance exceeded' in error
+               for error in errors_of({'max_trip_distance': problem['max_trip_distance'] // 4}))
+    tools = {tool_id: input_parser.Tool(tool.id, tool.size, 0, tool.cost)
+             for (tool_id, tool) in problem['tools'].items()}
+    assert any('available' in error for error in errors_of({'tools': tools}))
+
+
+def test_validate_solver_solutions():
+    """The solutions written by the solver are valid, and the validator recomputes the fitness of the solver."""
+    source = os.path.join(INSTANCES, 'ORTEC_Test_04.txt')
+    problem = input_parser.read_problem(source, use_cache=False)
+    genetic_solver.set_problem_instance(problem)
+
+    directory = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(directory, os.path.basename(source))
+        for seed in range(10):
+            candidate = genetic_solver.create_random_candidate(seed)
+            if not candidate.valid:
+                continue
+            output_parser.create_output_file(problem, candidate, filename)
+            solution = solution_validator.read_solution(os.path.join(directory, 'ORTEC_Test_04.sol.genetic.txt'))
+            (errors, costs) = solution_validator.validate_solution(problem, solution)
+            assert errors == [], errors
+            assert costs['cost'] == candidate.fit
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    test_validate_given_solutions()
+    test_validate_invalid_solutions()
+    test_validate_solver_solutions()
+    print("All checks passed")